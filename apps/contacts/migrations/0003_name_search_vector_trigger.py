@@ -0,0 +1,55 @@
+from django.db import migrations, transaction
+
+
+CREATE_TRIGGER_SQL = """
+CREATE TRIGGER contacts_name_search_vector_update
+BEFORE INSERT OR UPDATE OF name ON contacts
+FOR EACH ROW EXECUTE FUNCTION name_search_vector_update();
+"""
+
+# Same vectors as the trigger, written in primary key batches
+BACKFILL_SQL = """
+WITH batch AS (
+    SELECT id FROM contacts
+    WHERE {conditions}
+    ORDER BY id
+    LIMIT 1000
+)
+UPDATE contacts t
+SET name_search_vector = to_tsvector('simple', coalesce(t.name, ''))
+FROM batch
+WHERE t.id = batch.id
+RETURNING t.id
+"""
+
+
+def fill_name_search_vectors(apps, schema_editor):
+    """Recompute the vectors of existing rows, one short transaction per batch"""
+    connection = schema_editor.connection
+    last_id = None
+    while True:
+        conditions = "TRUE" if last_id is None else "id > %(last_id)s"
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(BACKFILL_SQL.format(conditions=conditions), {"last_id": last_id})
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return
+        last_id = max(ids)
+
+
+class Migration(migrations.Migration):
+    # Recomputes the english config vectors like users 0004
+    atomic = False
+
+    dependencies = [
+        ("contacts", "0002_name_trigram_index"),
+        ("users", "0004_name_search_vector_trigger"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CREATE_TRIGGER_SQL,
+            reverse_sql="DROP TRIGGER IF EXISTS contacts_name_search_vector_update ON contacts;",
+        ),
+        migrations.RunPython(fill_name_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("contacts", "0003_name_search_vector_trigger"),
+        ("users", "0005_user_contact_sync_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContactTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("phone_number", models.CharField(max_length=17)),
+                ("sync_version", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "contact_tombstones",
+            },
+        ),
+        migrations.AddField(
+            model_name="contact",
+            name="sync_version",
+            field=models.BigIntegerField(default=0),
+        ),
+        AddIndexConcurrently(
+            model_name="contact",
+            index=models.Index(
+                fields=["user", "sync_version"], name="contacts_user_id_400e49_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="contacttombstone",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="contact_tombstones",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contacttombstone",
+            index=models.Index(
+                fields=["user", "sync_version"], name="contact_tom_user_id_aed062_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="contacttombstone",
+            unique_together={("user", "phone_number")},
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:05
+
+from django.conf import settings
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models, transaction
+from django.db.models.functions import Cast, Substr
+
+# E.164 numbers whose digits fit a signed BIGINT, as in apps.core.phone
+PHONE_KEY_RE = r"^\+([1-9]\d{0,17})$"
+
+
+def fill_phone_key(apps, schema_editor):
+    """Fill phone_key of existing rows from e164 in primary key batches, one UPDATE each"""
+    model = apps.get_model("contacts", "Contact")
+    last_pk = None
+    while True:
+        rows = model.objects.order_by("pk")
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        pks = list(rows.values_list("pk", flat=True)[:10000])
+        if not pks:
+            return
+        with transaction.atomic():
+            model.objects.filter(pk__in=pks, e164__regex=PHONE_KEY_RE).update(
+                phone_key=Cast(Substr("e164", 2), models.BigIntegerField())
+            )
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    # Backfill batches commit one by one and indexes change concurrently
+    atomic = False
+
+    dependencies = [
+        ("contacts", "0005_contact_e164"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contact",
+            name="phone_key",
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_phone_key, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="contact",
+            index=models.Index(fields=["phone_key", "user"], name="contacts_phone_k_4b4281_idx"),
+        ),
+        RemoveIndexConcurrently(
+            model_name="contact",
+            name="contacts_e164_6e381e_idx",
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+# A number saved twice in different formats shares one phone key. The
+# migration stops and lists the conflicts rather than deleting contacts.
+DUPLICATES_SQL = """
+SELECT user_id, phone_key, COUNT(*)
+FROM contacts
+WHERE phone_key IS NOT NULL
+GROUP BY user_id, phone_key
+HAVING COUNT(*) > 1
+ORDER BY user_id, phone_key
+"""
+
+
+def check_duplicates(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DUPLICATES_SQL)
+        duplicates = cursor.fetchall()
+    if duplicates:
+        listed = ", ".join(
+            f"+{phone_key} of user {user_id} ({count} contacts)"
+            for user_id, phone_key, count in duplicates[:20]
+        )
+        raise RuntimeError(
+            f"Numbers saved more than once in an address book ({len(duplicates)}): {listed}. "
+            "Review them with 'python manage.py resolve_duplicate_phone_keys --dry-run', "
+            "resolve them by hand or by running it without --dry-run, then migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contacts", "0007_name_lower_c_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="contact",
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name="contact",
+            constraint=models.UniqueConstraint(
+                fields=("user", "phone_key"), name="unique_contact_phone_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.1 on 2026-10-17 09:40
+
+import re
+
+import phonenumbers
+from django.conf import settings
+from django.db import migrations, models
+
+NON_DIGITS_RE = re.compile(r"\D")
+PHONE_KEY_RE = re.compile(r"^\+([1-9]\d{0,17})$")
+
+
+def to_e164(raw, region):
+    """
+    apps.core.phone.to_e164 as of this migration, keeping the numbers it
+    cannot normalize as they are
+    """
+    digits = NON_DIGITS_RE.sub("", raw)
+    raw = raw.strip()
+    if not digits:
+        return raw
+    if raw.startswith("+"):
+        raw, region = "+" + digits, None
+    elif not region:
+        return raw
+    try:
+        number = phonenumbers.parse(raw, region)
+    except phonenumbers.NumberParseException:
+        return "+" + digits
+    if not phonenumbers.is_possible_number(number):
+        return "+" + digits
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def canonicalize_tombstones(apps, schema_editor):
+    """
+    Rewrite existing tombstones in E.164 form with their phone key
+    A number deleted in several spellings keeps its latest tombstone.
+    """
+    ContactTombstone = apps.get_model("contacts", "ContactTombstone")
+    region = getattr(settings, "PHONE_DEFAULT_REGION", None)
+    seen = set()
+    duplicates = []
+    changed = []
+    tombstones = ContactTombstone.objects.order_by("-sync_version", "-pk").only(
+        "pk", "user_id", "phone_number"
+    )
+    for tombstone in tombstones.iterator(chunk_size=10000):
+        e164 = to_e164(tombstone.phone_number, region)
+        if (tombstone.user_id, e164) in seen:
+            duplicates.append(tombstone.pk)
+            continue
+        seen.add((tombstone.user_id, e164))
+        match = PHONE_KEY_RE.match(e164)
+        tombstone.phone_number = e164
+        tombstone.phone_key = int(match.group(1)) if match else None
+        changed.append(tombstone)
+    ContactTombstone.objects.filter(pk__in=duplicates).delete()
+    ContactTombstone.objects.bulk_update(changed, ["phone_number", "phone_key"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contacts", "0008_unique_contact_phone_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contacttombstone",
+            name="phone_key",
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(canonicalize_tombstones, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,12 @@
-from django.db import models
+from django.db import models, connection, transaction
 import uuid
 from django.core.validators import RegexValidator
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Collate, Lower
 from django.contrib.postgres.search import SearchVectorField
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.contrib.postgres.search import SearchVector
+
+from apps.core.invalidation import publish
+from apps.core.phone import to_e164, to_phone_key
 
 class Contact(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -16,32 +17,210 @@ class Contact(models.Model):
         message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed."
     )
     phone_number = models.CharField(validators=[phone_regex], max_length=17)
-    name_search_vector = SearchVectorField(null=True)
+    e164 = models.CharField(max_length=17, null=True, editable=False)  # Canonical form used for lookups
+    phone_key = models.BigIntegerField(null=True, editable=False)  # e164 digits, the indexed lookup key
+    name_search_vector = SearchVectorField(null=True)  # Maintained by a database trigger
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    sync_version = models.BigIntegerField(default=0)
 
     class Meta:
         db_table = 'contacts'
         indexes = [
             models.Index(fields=['phone_number', 'user']),
+            models.Index(fields=['phone_key', 'user']),
             models.Index(fields=['name', 'user']),
+            models.Index(fields=['user', 'sync_version']),
             GinIndex(fields=['name_search_vector']),
+            GinIndex(
+                OpClass(Lower('name'), name='gin_trgm_ops'),
+                name='contacts_name_trgm_gin'
+            ),
+            # Byte ordered, so name prefix matches are read off in order
+            models.Index(
+                Collate(Lower('name'), 'C'),
+                name='contacts_name_lower_c_idx'
+            ),
         ]
         ordering = ['-created_at']
-        unique_together = ['user', 'phone_number']
+        # One contact per number however it was typed
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'phone_key'],
+                name='unique_contact_phone_key'
+            )
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.phone_number})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored number so a renumbered contact leaves a tombstone
+        instance._loaded_e164 = instance.__dict__.get('e164')
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
+    @staticmethod
+    def next_sync_version(user_id):
+        """
+        Allocate the next contact sync version for a user
+        The user row stays locked until the surrounding transaction commits,
+        so versions become visible to sync clients in allocation order.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE users SET contact_sync_version = contact_sync_version + 1 '
+                'WHERE id = %s RETURNING contact_sync_version',
+                [user_id]
+            )
+            return cursor.fetchone()[0]
+
+    @classmethod
+    def bulk_upsert(cls, user, names_by_number, sync_version, batch_size=1000):
+        """
+        Insert or rename a user's contacts with one lookup and one upsert
+        names_by_number maps E.164 numbers to names. Existing contacts are
+        matched on the phone key and keep the number they were stored with.
+        Must run in the transaction that allocated sync_version.
+        Returns (inserted, updated, unchanged) counts.
+        """
+        keys = {to_phone_key(e164): e164 for e164 in names_by_number}
+        existing = dict(
+            cls.objects.filter(
+                user=user,
+                phone_key__in=list(keys)
+            ).values_list('phone_key', 'name')
+        )
+        changed = []
+        previous_names = []
+        for phone_key, e164 in keys.items():
+            name = names_by_number[e164]
+            previous_name = existing.get(phone_key)
+            if previous_name == name:
+                continue
+            if previous_name is not None:
+                previous_names.append(previous_name)
+            changed.append(cls(
+                user=user,
+                name=name,
+                phone_number=e164,
+                e164=e164,
+                phone_key=phone_key,
+                sync_version=sync_version
+            ))
+        if changed:
+            cls.objects.bulk_create(
+                changed,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['user', 'phone_key'],
+                update_fields=['name', 'e164', 'updated_at', 'sync_version']
+            )
+            publish(
+                phone_numbers=[c.e164 for c in changed],
+                names=[c.name for c in changed] + previous_names
+            )
+        inserted = len(changed) - len(previous_names)
+        return inserted, len(previous_names), len(names_by_number) - len(changed)
+
+    @classmethod
+    def bulk_remove(cls, user, phone_numbers, sync_version):
+        """
+        Delete a user's contacts by E.164 number and leave tombstones for sync
+        Must run in the transaction that allocated sync_version.
+        Returns the stored numbers that were actually deleted.
+        """
+        contacts = cls.objects.filter(
+            user=user,
+            phone_key__in=[to_phone_key(e164) for e164 in phone_numbers]
+        )
+        rows = list(contacts.values_list('phone_number', 'e164', 'name'))
+        deleted = [phone_number for phone_number, _, _ in rows]
+        if deleted:
+            contacts.delete()
+            ContactTombstone.record(
+                user.pk,
+                [e164 or phone_number for phone_number, e164, _ in rows],
+                sync_version
+            )
+            publish(
+                phone_numbers=[e164 for _, e164, _ in rows],
+                names=[name for _, _, name in rows]
+            )
+        return deleted
+
     def save(self, *args, **kwargs):
-        """Override save to ensure phone number is standardized"""
+        """Override save to ensure phone number is standardized and versioned"""
         if self.phone_number:
             self.phone_number = self.phone_number.strip().replace(" ", "")
-        super().save(*args, **kwargs)
+        self.e164 = to_e164(self.phone_number)
+        self.phone_key = to_phone_key(self.e164)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'sync_version', 'e164', 'phone_key'}
 
-@receiver(post_save, sender=Contact)
-def update_search_vector(sender, instance, **kwargs):
-    """Update search vector when contact is saved"""
-    Contact.objects.filter(pk=instance.pk).update(
-        name_search_vector=SearchVector('name')
-    )
+        with transaction.atomic():
+            self.sync_version = Contact.next_sync_version(self.user_id)
+            previous_e164 = getattr(self, '_loaded_e164', None)
+            if previous_e164 and previous_e164 != self.e164:
+                ContactTombstone.record(self.user_id, [previous_e164], self.sync_version)
+            super().save(*args, **kwargs)
+            publish(
+                phone_numbers=[self.e164, getattr(self, '_loaded_e164', None)],
+                names=[self.name, getattr(self, '_loaded_name', None)]
+            )
+        self._loaded_e164 = self.e164
+        self._loaded_name = self.name
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            sync_version = Contact.next_sync_version(self.user_id)
+            ContactTombstone.record(self.user_id, [self.e164 or self.phone_number], sync_version)
+            publish(
+                phone_numbers=[self.e164],
+                names=[self.name]
+            )
+            return super().delete(*args, **kwargs)
+
+
+class ContactTombstone(models.Model):
+    """
+    Marks a contact number deleted from a user's address book
+    so incremental sync can tell clients to remove it.
+    Numbers are kept in E.164 form, and tombstones whose phone key was
+    added back, however it was typed, are ignored on read.
+    """
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='contact_tombstones')
+    phone_number = models.CharField(max_length=17)  # E.164 form, as clients send deletes
+    phone_key = models.BigIntegerField(null=True, editable=False)
+    sync_version = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'contact_tombstones'
+        indexes = [
+            models.Index(fields=['user', 'sync_version']),
+        ]
+        unique_together = ['user', 'phone_number']
+
+    def __str__(self):
+        return f"Deleted contact {self.phone_number}"
+
+    @classmethod
+    def record(cls, user_id, phone_numbers, sync_version):
+        e164s = {to_e164(phone_number) or phone_number for phone_number in phone_numbers}
+        cls.objects.bulk_create(
+            [
+                cls(
+                    user_id=user_id,
+                    phone_number=e164,
+                    phone_key=to_phone_key(e164),
+                    sync_version=sync_version
+                )
+                for e164 in e164s
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'phone_number'],
+            update_fields=['sync_version', 'deleted_at']
+        )
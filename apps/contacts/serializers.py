@@ -1,13 +1,31 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.core.validators import RegexValidator
+from django.db import models
 from .models import Contact
+from apps.core.phone import to_e164, to_phone_key
 from apps.spam.models import SpamReport
+from apps.users.models import User
+
+class ContactListSerializer(serializers.ListSerializer):
+    """
+    Resolves spam likelihoods for every contact in one batch
+    before the rows are serialized
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        contacts = list(iterable)
+        self.context['spam_likelihoods'] = SpamReport.get_spam_likelihoods(
+            contact.e164 for contact in contacts if contact.e164
+        )
+        return super().to_representation(contacts)
 
 class ContactSerializer(serializers.ModelSerializer):
     spam_likelihood = serializers.FloatField(read_only=True, required=False)
     
     class Meta:
         model = Contact
+        list_serializer_class = ContactListSerializer
         fields = ['id', 'name', 'phone_number', 'created_at', 'updated_at', 'spam_likelihood']
         read_only_fields = ['id', 'created_at', 'updated_at']
         extra_kwargs = {
@@ -26,6 +44,8 @@ class ContactSerializer(serializers.ModelSerializer):
             phone_regex(value)
         except Exception as e:
             raise serializers.ValidationError(str(e))
+        if to_phone_key(to_e164(value)) is None:
+            raise serializers.ValidationError("Enter the phone number with its country code.")
         return value
 
     def validate(self, data):
@@ -43,7 +63,7 @@ class ContactSerializer(serializers.ModelSerializer):
             if phone_number:
                 existing_contact = Contact.objects.filter(
                     user=request.user,
-                    phone_number=phone_number
+                    phone_key=to_phone_key(to_e164(phone_number))
                 ).exclude(id=getattr(self.instance, 'id', None))
                 
                 if existing_contact.exists():
@@ -57,7 +77,11 @@ class ContactSerializer(serializers.ModelSerializer):
         Add spam likelihood to the response
         """
         data = super().to_representation(instance)
-        data['spam_likelihood'] = SpamReport.get_spam_likelihood(instance.phone_number)
+        spam_likelihoods = self.context.get('spam_likelihoods') or {}
+        if instance.e164 in spam_likelihoods:
+            data['spam_likelihood'] = spam_likelihoods[instance.e164]
+        else:
+            data['spam_likelihood'] = SpamReport.get_spam_likelihood(instance.e164)
         return data
 
 class ContactBulkCreateSerializer(ContactSerializer):
@@ -71,6 +95,87 @@ class ContactBulkCreateSerializer(ContactSerializer):
         user = self.context['request'].user
         return Contact.objects.create(user=user, **validated_data)
 
+def normalize_contact_rows(rows):
+    """
+    Validate {name, phone_number} rows entirely in memory
+    Numbers are keyed by their E.164 form, so address book formatting
+    such as '+1 (555) 123-4567' is accepted. Invalid rows are counted and
+    dropped instead of failing the upload, and the last entry wins when
+    a number appears more than once
+    """
+    names_by_number = {}
+    invalid = 0
+    for row in rows:
+        name = str(row.get('name') or '').strip()
+        phone_number = to_e164(str(row.get('phone_number') or ''))
+        if (
+            not name
+            or len(name) > Contact._meta.get_field('name').max_length
+            or phone_number is None
+            or to_phone_key(phone_number) is None
+            or not Contact.phone_regex.regex.match(phone_number)
+        ):
+            invalid += 1
+            continue
+        names_by_number[phone_number] = name
+    return {
+        'names_by_number': names_by_number,
+        'invalid': invalid,
+        'duplicates': len(rows) - invalid - len(names_by_number),
+    }
+
+class ContactImportSerializer(serializers.Serializer):
+    """
+    Validates an address book upload without touching the database
+    """
+    contacts = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.CONTACT_IMPORT_MAX_ROWS
+    )
+
+    def validate_contacts(self, rows):
+        return normalize_contact_rows(rows)
+
+class ContactSyncSerializer(serializers.Serializer):
+    """
+    Validates a differential sync request
+    sync_token is the token returned by the previous sync, omit it for a full sync
+    """
+    sync_token = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    upserts = serializers.ListField(
+        child=serializers.DictField(),
+        required=False,
+        default=list,
+        max_length=settings.CONTACT_IMPORT_MAX_ROWS
+    )
+    deletes = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        default=list,
+        max_length=settings.CONTACT_IMPORT_MAX_ROWS
+    )
+
+    def validate_upserts(self, rows):
+        return normalize_contact_rows(rows)
+
+    def validate_deletes(self, phone_numbers):
+        return {to_e164(phone_number) for phone_number in phone_numbers} - {None}
+
+class ContactDetailListSerializer(ContactListSerializer):
+    """
+    Resolves which contacts are registered users, and whose email the
+    requester may see, in one query for the whole list
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        contacts = list(iterable)
+        self.context['visible_emails'] = User.visible_emails(
+            self.context['request'].user,
+            (contact.e164 for contact in contacts)
+        )
+        return super().to_representation(contacts)
+
 class ContactDetailSerializer(ContactSerializer):
     """
     Serializer for detailed contact view including additional information
@@ -79,14 +184,28 @@ class ContactDetailSerializer(ContactSerializer):
     email = serializers.EmailField(read_only=True)
 
     class Meta(ContactSerializer.Meta):
+        list_serializer_class = ContactDetailListSerializer
         fields = ContactSerializer.Meta.fields + ['is_registered_user', 'email']
 
+    def _visible_emails(self, obj):
+        """Registered numbers mapped to the email the requester may see"""
+        visible_emails = self.context.get('visible_emails')
+        if visible_emails is not None:
+            return visible_emails
+        # A single contact is looked up once for both fields
+        single = self.__dict__.setdefault('_single_visible_emails', {})
+        if obj.e164 not in single:
+            single[obj.e164] = User.visible_emails(
+                self.context['request'].user,
+                [obj.e164]
+            )
+        return single[obj.e164]
+
     def get_is_registered_user(self, obj):
         """
         Check if this contact is a registered user
         """
-        from apps.users.models import User
-        return User.objects.filter(phone_number=obj.phone_number).exists()
+        return obj.e164 in self._visible_emails(obj)
 
     def to_representation(self, instance):
         """
@@ -94,17 +213,9 @@ class ContactDetailSerializer(ContactSerializer):
         """
         data = super().to_representation(instance)
         
-        # If contact is a registered user, try to get their email
+        # Only include email if the requesting user is in the contact's contact list
         if data['is_registered_user']:
-            from apps.users.models import User
-            user = User.objects.get(phone_number=instance.phone_number)
-            
-            # Only include email if the requesting user is in the contact's contact list
-            request_user = self.context.get('request').user
-            if user.contacts.filter(phone_number=request_user.phone_number).exists():
-                data['email'] = user.email
-            else:
-                data['email'] = None
+            data['email'] = self._visible_emails(instance)[instance.e164]
         
         return data
 
@@ -121,7 +232,9 @@ class ContactSearchSerializer(ContactSerializer):
         """
         Get total number of spam reports for this contact's number
         """
+        if obj.phone_key is None:
+            return 0
         return SpamReport.objects.filter(
-            phone_number=obj.phone_number,
+            phone_key=obj.phone_key,
             is_active=True
         ).count()
\ No newline at end of file
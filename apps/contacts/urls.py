@@ -1,8 +1,14 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 from rest_framework.routers import DefaultRouter
-from .views import ContactViewSet
+from .views import ContactViewSet, by_phone_number_async
 
 router = DefaultRouter()
 router.register('contacts', ContactViewSet, basename='contacts')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls
+
+if settings.ASYNC_LOOKUP_VIEWS:
+    urlpatterns = [re_path(
+        r'^contacts/phone/(?P<phone_number>[^/.]+)/$', by_phone_number_async, name='contacts-by-phone-number'
+    )] + urlpatterns
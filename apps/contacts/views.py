@@ -1,15 +1,28 @@
+import asyncio
+
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 
-from .models import Contact
-from .serializers import ContactSerializer
+from apps.core.async_views import async_api_view
+from apps.core.pagination import OptionalCursorPagination
+from apps.core.phone import to_e164, to_phone_key
 from apps.spam.models import SpamReport
+from apps.users.models import User
+from .models import Contact, ContactTombstone
+from .serializers import (
+    ContactSerializer,
+    ContactImportSerializer,
+    ContactSyncSerializer
+)
 
 class ContactViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = ContactSerializer
+    pagination_class = OptionalCursorPagination
     
     def get_queryset(self):
         return Contact.objects.filter(user=self.request.user)
@@ -33,12 +46,11 @@ class ContactViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='phone/(?P<phone_number>[^/.]+)')
     def by_phone_number(self, request, phone_number=None):
-        contact = self.get_queryset().filter(phone_number=phone_number).first()
+        phone_key = to_phone_key(to_e164(phone_number))
+        contact = phone_key and self.get_queryset().filter(phone_key=phone_key).first()
         if contact:
             serializer = self.get_serializer(contact)
-            data = serializer.data
-            data['spam_likelihood'] = SpamReport.get_spam_likelihood(phone_number)
-            return Response(data)
+            return Response(serializer.data)
         return Response(
             {'error': 'Contact not found'},
             status=status.HTTP_404_NOT_FOUND
@@ -53,4 +65,126 @@ class ContactViewSet(viewsets.ModelViewSet):
                 self.get_serializer(contacts, many=True).data,
                 status=status.HTTP_201_CREATED
             )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_contacts(self, request):
+        """
+        Import a full address book in one pass
+        Accepts a list of {name, phone_number} rows (or {"contacts": [...]})
+        and returns counts instead of the serialized contacts
+        """
+        data = request.data
+        if isinstance(data, list):
+            data = {'contacts': data}
+        serializer = ContactImportSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        contacts = serializer.validated_data['contacts']
+        with transaction.atomic():
+            inserted, updated, unchanged = Contact.bulk_upsert(
+                request.user,
+                contacts['names_by_number'],
+                Contact.next_sync_version(request.user.pk)
+            )
+        return Response({
+            'inserted': inserted,
+            'updated': updated,
+            'skipped': unchanged + contacts['duplicates'],
+            'invalid': contacts['invalid']
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='sync')
+    def sync(self, request):
+        """
+        Apply a client delta and return the server changes since its token
+        The delta is applied in one transaction under a new per-user sync
+        version; changes made by other devices since sync_token come back
+        as upserts and deletes along with the token for the next sync
+        """
+        serializer = ContactSyncSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        user = request.user
+        names_by_number = data['upserts']['names_by_number']
+        deleted_numbers = data['deletes'] - names_by_number.keys()
+        since = data.get('sync_token') or 0
+
+        with transaction.atomic():
+            own_version = None
+            inserted = updated = 0
+            deleted = []
+            if names_by_number or deleted_numbers:
+                own_version = Contact.next_sync_version(user.pk)
+                inserted, updated, _ = Contact.bulk_upsert(
+                    user, names_by_number, own_version
+                )
+                deleted = Contact.bulk_remove(user, deleted_numbers, own_version)
+                sync_version = own_version
+            else:
+                sync_version = User.objects.filter(
+                    pk=user.pk
+                ).values_list('contact_sync_version', flat=True).get()
+
+            # A token from the future cannot be trusted, resend everything
+            if since > sync_version:
+                since = 0
+
+            if since:
+                changed = Contact.objects.filter(user=user, sync_version__gt=since)
+                removed = ContactTombstone.objects.filter(
+                    user=user,
+                    sync_version__gt=since
+                ).exclude(
+                    Exists(Contact.objects.filter(user=user, phone_key=OuterRef('phone_key')))
+                )
+                # The client already knows about the delta it just sent
+                if own_version is not None:
+                    changed = changed.exclude(sync_version=own_version)
+                    removed = removed.exclude(sync_version=own_version)
+                deletes = list(removed.values_list('phone_number', flat=True))
+            else:
+                # Full sync: the client replaces its copy with this snapshot
+                changed = Contact.objects.filter(user=user)
+                deletes = []
+
+            upserts = self.get_serializer(changed, many=True).data
+
+        return Response({
+            'sync_token': str(sync_version),
+            'upserts': upserts,
+            'deletes': deletes,
+            'applied': {
+                'inserted': inserted,
+                'updated': updated,
+                'deleted': len(deleted),
+                'invalid': data['upserts']['invalid']
+            }
+        }, status=status.HTTP_200_OK)
+
+
+@async_api_view
+async def by_phone_number_async(request, phone_number):
+    """
+    ContactViewSet.by_phone_number for ASGI deployments
+    The contact and its spam likelihood only depend on the number, so
+    both are looked up at once.
+    """
+    phone_number = to_e164(phone_number)
+    phone_key = to_phone_key(phone_number)
+    contact = None
+    if phone_key is not None:
+        contact, spam_likelihoods = await asyncio.gather(
+            Contact.objects.filter(user=request.user, phone_key=phone_key).afirst(),
+            SpamReport.aget_spam_likelihoods([phone_number])
+        )
+    if contact is None:
+        return {'error': 'Contact not found'}, status.HTTP_404_NOT_FOUND
+    serializer = ContactSerializer(
+        contact,
+        context={'request': request, 'spam_likelihoods': spam_likelihoods}
+    )
+    return serializer.data, status.HTTP_200_OK
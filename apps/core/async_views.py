@@ -0,0 +1,104 @@
+"""
+Plain async Django views for the read-only lookup endpoints.
+DRF views are synchronous, so under ASGI every call would hold a thread
+while it waits on Postgres. These views authenticate the JWT themselves,
+apply the same throttles and return JSON like the DRF views do.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from apps.users.models import User
+
+jwt_authentication = JWTAuthentication()
+
+
+async def authenticate(request):
+    """
+    The user a request's bearer token belongs to, None without a token
+    The token is checked in process, only the user is read from the database.
+    """
+    header = jwt_authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = jwt_authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    token = jwt_authentication.get_validated_token(raw_token)
+    try:
+        user = await User.objects.aget(
+            **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]}
+        )
+    except (KeyError, User.DoesNotExist):
+        raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+def json_response(data, status_code, headers=None):
+    # Compact like DRF's JSONRenderer
+    return JsonResponse(
+        data,
+        status=status_code,
+        headers=headers,
+        safe=False,
+        json_dumps_params={'separators': (',', ':')}
+    )
+
+
+def _error(detail, status_code, headers=None):
+    if not isinstance(detail, dict):
+        detail = {'detail': detail}
+    return json_response(detail, status_code, headers)
+
+
+def async_api_view(view):
+    """
+    Serve an async GET view behind the API's authentication and throttles
+    The view gets a DRF request with the authenticated user, so the DRF
+    views' helpers and serializers work unchanged, and returns (data, status).
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = Request(request, authenticators=())
+        if request.method != 'GET':
+            return _error(
+                f'Method "{request.method}" not allowed.',
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+                {'Allow': 'GET'}
+            )
+        try:
+            user = await authenticate(request)
+        except exceptions.AuthenticationFailed as e:
+            user, failure = None, e.detail
+        else:
+            failure = 'Authentication credentials were not provided.'
+        if user is None:
+            return _error(
+                failure,
+                status.HTTP_401_UNAUTHORIZED,
+                {'WWW-Authenticate': jwt_authentication.authenticate_header(request)}
+            )
+        request.user = user
+
+        for throttle in [throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES]:
+            if not await sync_to_async(throttle.allow_request)(request, None):
+                wait = throttle.wait()
+                return _error(
+                    'Request was throttled.',
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    {'Retry-After': str(int(wait))} if wait is not None else None
+                )
+
+        data, status_code = await view(request, *args, **kwargs)
+        return json_response(data, status_code)
+    # Bearer tokens are not sent by browsers on their own, as with DRF's views
+    return csrf_exempt(wrapper)
@@ -0,0 +1,177 @@
+import hashlib
+import pickle
+import uuid
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisSerializer
+
+
+class CompressedRedisSerializer(RedisSerializer):
+    """
+    Redis serializer that zlib-compresses large pickled values
+    Search responses can run to tens of kilobytes, so anything over
+    CACHE_COMPRESS_MIN_BYTES is compressed before it goes over the wire.
+    Integers are still stored raw so incr/decr keep working.
+    """
+    marker = b'zlib:'
+
+    def dumps(self, obj):
+        data = super().dumps(obj)
+        if isinstance(data, bytes) and len(data) >= settings.CACHE_COMPRESS_MIN_BYTES:
+            return self.marker + zlib.compress(data)
+        return data
+
+    def loads(self, data):
+        if isinstance(data, bytes) and data.startswith(self.marker):
+            return pickle.loads(zlib.decompress(data[len(self.marker):]))
+        return super().loads(data)
+
+
+def hashed_key(prefix, *parts):
+    """
+    Build a cache key from free-form parts such as search queries
+    The parts are hashed so keys stay short and free of whitespace.
+    """
+    digest = hashlib.sha1(
+        '\x1f'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'{prefix}_{digest}'
+
+
+class TaggedCache:
+    """
+    Cache entries tagged with the invalidation keys they depend on
+    Every tag has a version stored in the same cache. An entry remembers
+    the versions its tags had before it was computed and turns into a miss
+    as soon as one of them is bumped, so purging a tag is a single write
+    however many entries carry it. Tag versions expire after
+    CACHE_TAG_TIMEOUT, which reads as a purge, so the cache only holds
+    tags that were written recently.
+    The a-prefixed methods are the same operations on the async cache API.
+    """
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _tag_key(tag):
+        return f'tag:{tag}'
+
+    def versions(self, tags):
+        """Current version of each tag, None for tags that have never been set"""
+        tags = list(tags)
+        found = self.cache.get_many([self._tag_key(tag) for tag in tags])
+        return {tag: found.get(self._tag_key(tag)) for tag in tags}
+
+    async def aversions(self, tags):
+        tags = list(tags)
+        found = await self.cache.aget_many([self._tag_key(tag) for tag in tags])
+        return {tag: found.get(self._tag_key(tag)) for tag in tags}
+
+    def _read_keys(self, keys, tags):
+        return keys + [self._tag_key(tag) for tag in tags]
+
+    def _split(self, found, keys, tags):
+        """Tag versions and cache entries out of one get_many result"""
+        versions = {tag: found.get(self._tag_key(tag)) for tag in tags}
+        entries = {key: found[key] for key in keys if key in found}
+        carried = {tag for entry in entries.values() for tag in entry['tags']}
+        return versions, entries, carried - versions.keys()
+
+    @staticmethod
+    def _hits(entries, versions):
+        return {
+            key: entry['value']
+            for key, entry in entries.items()
+            if all(versions[tag] == version for tag, version in entry['tags'].items())
+        }
+
+    def get_many(self, keys, tags=()):
+        """
+        Look up keys and read the versions of tags in the same round trip
+        Returns (hits, versions). Read tags before computing a missed value
+        and hand the versions to set_many, so a purge that lands while the
+        value is being computed is not lost.
+        """
+        keys = list(keys)
+        tags = list(tags)
+        found = self.cache.get_many(self._read_keys(keys, tags))
+        versions, entries, unread = self._split(found, keys, tags)
+        if unread:
+            versions.update(self.versions(unread))
+        return self._hits(entries, versions), versions
+
+    async def aget_many(self, keys, tags=()):
+        keys = list(keys)
+        tags = list(tags)
+        found = await self.cache.aget_many(self._read_keys(keys, tags))
+        versions, entries, unread = self._split(found, keys, tags)
+        if unread:
+            versions.update(await self.aversions(unread))
+        return self._hits(entries, versions), versions
+
+    def get(self, key, tags=()):
+        hits, versions = self.get_many([key], tags)
+        return hits.get(key), versions
+
+    async def aget(self, key, tags=()):
+        hits, versions = await self.aget_many([key], tags)
+        return hits.get(key), versions
+
+    def _entries(self, values, tags_by_key, versions):
+        entries = {}
+        for key, value in values.items():
+            tags = tags_by_key[key]
+            if all(versions[tag] is not None for tag in tags):
+                entries[key] = {
+                    'value': value,
+                    'tags': {tag: versions[tag] for tag in tags},
+                }
+        return entries
+
+    def set_many(self, values, tags_by_key, versions, timeout):
+        """
+        Store values tagged with the versions read before they were computed
+        Tags that had no version yet are created, but entries carrying them
+        are not stored since a purge may have raced with the computation.
+        """
+        for tag, version in versions.items():
+            if version is None:
+                self.cache.add(
+                    self._tag_key(tag),
+                    uuid.uuid4().hex,
+                    timeout=settings.CACHE_TAG_TIMEOUT
+                )
+        entries = self._entries(values, tags_by_key, versions)
+        if entries:
+            self.cache.set_many(entries, timeout=timeout)
+
+    async def aset_many(self, values, tags_by_key, versions, timeout):
+        for tag, version in versions.items():
+            if version is None:
+                await self.cache.aadd(
+                    self._tag_key(tag),
+                    uuid.uuid4().hex,
+                    timeout=settings.CACHE_TAG_TIMEOUT
+                )
+        entries = self._entries(values, tags_by_key, versions)
+        if entries:
+            await self.cache.aset_many(entries, timeout=timeout)
+
+    def set(self, key, value, tags, versions, timeout):
+        self.set_many({key: value}, {key: tags}, versions, timeout)
+
+    async def aset(self, key, value, tags, versions, timeout):
+        await self.aset_many({key: value}, {key: tags}, versions, timeout)
+
+    def invalidate(self, tags):
+        """Bump the version of every tag, turning all entries that carry them into misses"""
+        self.cache.set_many(
+            {self._tag_key(tag): uuid.uuid4().hex for tag in tags},
+            timeout=settings.CACHE_TAG_TIMEOUT
+        )
@@ -0,0 +1,62 @@
+"""
+Cache invalidation events.
+Writes publish the phone numbers and names they touched, and each app
+purges the cached entries tagged with them once the write has committed.
+"""
+import re
+
+from django.db import transaction
+from django.dispatch import Signal
+
+# Sent after commit with phone_numbers and names keyword arguments
+cache_invalidated = Signal()
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+# Queries without a word of at least three characters share one tag that
+# every name change purges
+SHORT_QUERY_TAG = 'name:*'
+
+
+def phone_tag(phone_number):
+    return f'phone:{phone_number}'
+
+
+def name_tags(name):
+    """
+    Tags purged when a name is added, renamed or removed
+    Every trigram of every word, so any cached query that can match the
+    name is reached through the tag from query_tag.
+    """
+    tags = {SHORT_QUERY_TAG}
+    for word in WORD_RE.findall(name.lower()):
+        tags.update(f'name:{word[i:i + 3]}' for i in range(len(word) - 2))
+    return tags
+
+
+def query_tag(query):
+    """
+    Tag for a cached name search
+    A matching name contains the query or has words starting with each
+    query word, so it always contains the first three characters of the
+    first query word that is long enough.
+    """
+    for word in WORD_RE.findall(query.lower()):
+        if len(word) >= 3:
+            return f'name:{word[:3]}'
+    return SHORT_QUERY_TAG
+
+
+def publish(phone_numbers=(), names=()):
+    """Announce changed phone numbers and names once the current transaction commits"""
+    phone_numbers = {phone_number for phone_number in phone_numbers if phone_number}
+    names = {name for name in names if name}
+    if not phone_numbers and not names:
+        return
+    transaction.on_commit(
+        lambda: cache_invalidated.send(
+            sender=None,
+            phone_numbers=phone_numbers,
+            names=names
+        )
+    )
@@ -0,0 +1,115 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+    Raises ValueError when the cursor has been tampered with
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def wants_total(request):
+    """Totals are skipped in cursor mode unless ?with_total=1 is passed"""
+    return request.query_params.get('with_total') in ('1', 'true', 'True')
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset mode
+    Passing ?cursor= (empty for the first page) pages on keyset_fields in
+    descending order instead of OFFSET, and skips the COUNT unless
+    ?with_total=1 is passed.
+    """
+    cursor_query_param = 'cursor'
+    keyset_fields = ('created_at', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total = queryset.count() if wants_total(request) else None
+
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound('Invalid cursor')
+            if len(after) != len(self.keyset_fields):
+                raise NotFound('Invalid cursor')
+            queryset = queryset.filter(self._after(self._parse(queryset.model, after)))
+
+        ordering = [f'-{field}' for field in self.keyset_fields]
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page_rows = rows[:self.page_size]
+        return self.page_rows
+
+    def _parse(self, model, values):
+        """Convert decoded cursor values to the keyset fields' Python types"""
+        parsed = []
+        for field, value in zip(self.keyset_fields, values):
+            try:
+                value = model._meta.get_field(field).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+            if value is None:
+                raise NotFound('Invalid cursor')
+            parsed.append(value)
+        return parsed
+
+    def _after(self, values):
+        """Rows strictly after values in (field1 DESC, field2 DESC, ...) order"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.keyset_fields, values):
+            condition |= equal & Q(**{f'{field}__lt': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def get_next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.page_rows[-1]
+        return encode_cursor(getattr(last, field) for field in self.keyset_fields)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        next_cursor = self.get_next_cursor()
+        url = self.request.build_absolute_uri()
+        response = OrderedDict([
+            ('next', replace_query_param(url, self.cursor_query_param, next_cursor)
+                if next_cursor else None),
+            ('next_cursor', next_cursor),
+            ('results', data),
+        ])
+        if self.total is not None:
+            response['count'] = self.total
+        return Response(response)
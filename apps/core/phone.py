@@ -0,0 +1,115 @@
+"""
+Phone number normalization.
+Every stored and queried number goes through to_e164, so one number maps
+to one key however it was typed. to_phone_key turns that key into the
+integer the lookup indexes and joins use.
+"""
+import re
+from functools import lru_cache
+
+import phonenumbers
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Cast, Substr
+
+NON_DIGITS_RE = re.compile(r'\D')
+
+# E.164 numbers never start with 0 and 18 digits always fit a signed
+# BIGINT, so matching numbers round-trip through their integer key
+PHONE_KEY_RE = re.compile(r'^\+([1-9]\d{0,17})$')
+
+
+@lru_cache(maxsize=settings.PHONE_PARSE_CACHE_SIZE)
+def _parse_e164(raw, region):
+    """Format raw as E.164, None when phonenumbers cannot make sense of it"""
+    try:
+        number = phonenumbers.parse(raw, region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def to_e164(raw):
+    """
+    Canonical E.164 form of a phone number
+    Numbers without a leading + are read in PHONE_DEFAULT_REGION. Numbers
+    that cannot be parsed fall back to + followed by their digits.
+    Returns None when raw has no digits at all, and for numbers without a
+    leading + when no region is configured, as their country is unknown.
+    """
+    if raw is None:
+        return None
+    raw = raw.strip()
+    digits = NON_DIGITS_RE.sub('', raw)
+    if not digits:
+        return None
+
+    if raw.startswith('+'):
+        return _parse_e164('+' + digits, None) or '+' + digits
+    region = settings.PHONE_DEFAULT_REGION
+    if not region:
+        return None
+    return _parse_e164(raw, region) or '+' + digits
+
+
+def to_phone_key(e164):
+    """
+    Integer phone key of an E.164 number, its digits read as a BIGINT
+    Eight bytes instead of a varchar of up to 17, so the indexes and joins
+    on it stay compact. Returns None for None and for numbers too long to
+    fit or that start with 0, which then match nothing.
+    """
+    if e164 is None:
+        return None
+    match = PHONE_KEY_RE.match(e164)
+    return int(match.group(1)) if match else None
+
+
+def from_phone_key(phone_key):
+    """E.164 number a phone key was derived from"""
+    return f'+{phone_key}'
+
+
+def backfill_e164(model, batch_size=1000):
+    """
+    Fill the e164 column of existing rows in primary key batches
+    Used by the migrations that add the column. Each batch is written in
+    its own short transaction.
+    """
+    last_pk = None
+    while True:
+        rows = model.objects.filter(e164__isnull=True).order_by('pk')
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        batch = list(rows.only('pk', 'phone_number')[:batch_size])
+        if not batch:
+            return
+        for row in batch:
+            row.e164 = to_e164(row.phone_number)
+        with transaction.atomic():
+            model.objects.bulk_update(batch, ['e164'])
+        last_pk = batch[-1].pk
+
+
+def backfill_phone_key(model, batch_size=10000):
+    """
+    Fill the phone_key column of existing rows from their e164 column
+    Walks the primary key in batches and converts each batch with a single
+    UPDATE in its own transaction.
+    """
+    last_pk = None
+    while True:
+        rows = model.objects.order_by('pk')
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        pks = list(rows.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        with transaction.atomic():
+            model.objects.filter(
+                pk__in=pks,
+                e164__regex=PHONE_KEY_RE.pattern
+            ).update(phone_key=Cast(Substr('e164', 2), models.BigIntegerField()))
+        last_pk = pks[-1]
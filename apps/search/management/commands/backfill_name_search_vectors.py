@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from apps.search.queries import backfill_name_search_vectors
+
+TABLES = ('users', 'contacts')
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute name_search_vector for existing users and contacts in '
+        'small batches so the tables are never locked for long'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table',
+            choices=TABLES,
+            help='Only backfill one table (default: both)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows updated per transaction'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Seconds to pause between batches to limit load'
+        )
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help='Only fill rows whose vector is still NULL'
+        )
+
+    def handle(self, *args, **options):
+        tables = [options['table']] if options['table'] else TABLES
+        for table in tables:
+            updated = backfill_name_search_vectors(
+                table,
+                batch_size=options['batch_size'],
+                only_missing=options['only_missing'],
+                sleep=options['sleep']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Backfilled {updated} rows in {table}'
+            ))
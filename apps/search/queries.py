@@ -0,0 +1,384 @@
+"""
+Raw SQL for the search endpoints.
+The ranked union of users and contacts cannot be expressed by the ORM
+in a single round trip, so it lives here instead of in the views.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.core.phone import from_phone_key, to_phone_key
+from apps.spam.scoring import decayed_weight
+
+# Match tiers (exact, name prefix, word prefix, substring) are spaced 0.1
+# apart and trigram similarity orders rows within a tier.
+NAME_RANK_SQL = """
+    (
+        CASE
+            WHEN lower({table}.name) = %(query)s THEN 1.0
+            WHEN lower({table}.name) LIKE %(prefix)s THEN 0.8
+            WHEN {word_match} THEN 0.7
+            ELSE 0.6
+        END
+        + 0.05 * similarity(lower({table}.name), %(query)s)
+    )::double precision
+"""
+
+# The substring test uses the pg_trgm index on lower(name) and the word
+# prefix test uses the GIN index on name_search_vector.
+SUBSTRING_MATCH_SQL = "lower({table}.name) LIKE %(contains)s"
+
+# Names must not be stemmed, so the prefix query uses the simple config.
+WORD_MATCH_SQL = "{table}.name_search_vector @@ to_tsquery('simple', %(tsquery)s)"
+
+# Candidates are read tier by tier so that no tier scans more than
+# candidate_limit rows before ranking. Exact and prefix matches come off
+# the C collated lower(name) btree in name order, word prefix and
+# substring matches are capped as they are found, and a row only enters
+# the first tier it matches.
+NAME_CANDIDATES_SQL = """
+    (
+        SELECT {columns}, {rank} AS search_rank
+        FROM {source}
+        WHERE lower({table}.name) COLLATE "C" LIKE %(prefix)s
+        ORDER BY lower({table}.name) COLLATE "C"
+        LIMIT %(candidate_limit)s
+    )
+    UNION ALL
+    (
+        SELECT {columns}, {rank} AS search_rank
+        FROM {source}
+        WHERE {word_match}
+          AND NOT lower({table}.name) COLLATE "C" LIKE %(prefix)s
+        LIMIT %(candidate_limit)s
+    )
+    UNION ALL
+    (
+        SELECT {columns}, {rank} AS search_rank
+        FROM {source}
+        WHERE {substring_match}
+          AND NOT lower({table}.name) COLLATE "C" LIKE %(prefix)s
+          AND NOT {word_match}
+        LIMIT %(candidate_limit)s
+    )
+"""
+
+# Rows are deduplicated on the canonical E.164 number. Registered users win
+# the DISTINCT ON dedup, otherwise the best ranked contact name is kept.
+NAME_MATCHES_SQL = """
+WITH matches AS (
+    {user_candidates}
+    UNION ALL
+    {contact_candidates}
+),
+ranked AS (
+    SELECT DISTINCT ON (phone_number)
+           name, phone_number, email, is_registered_user, search_rank
+    FROM matches
+    ORDER BY phone_number, is_registered_user DESC, search_rank DESC, name
+)
+"""
+
+NAME_PAGE_SQL = """
+, counted AS (
+    SELECT COUNT(*) AS total FROM ranked
+)
+SELECT page.name, page.phone_number, page.email,
+       page.is_registered_user, page.search_rank, counted.total
+FROM counted
+LEFT JOIN LATERAL (
+    SELECT *
+    FROM ranked
+    ORDER BY search_rank DESC, name, phone_number
+    LIMIT %(limit)s
+    OFFSET LEAST(
+        %(offset)s,
+        GREATEST((counted.total - 1) / %(limit)s, 0) * %(limit)s
+    )
+) page ON TRUE
+"""
+
+# Keyset page on (search_rank DESC, name, phone_number), negating the rank
+# so the whole key compares as a single row value.
+NAME_CURSOR_SQL = """
+, counted AS (
+    SELECT {total} AS total
+)
+SELECT page.name, page.phone_number, page.email,
+       page.is_registered_user, page.search_rank, counted.total
+FROM counted
+LEFT JOIN LATERAL (
+    SELECT *
+    FROM ranked
+    WHERE {after}
+    ORDER BY search_rank DESC, name, phone_number
+    LIMIT %(limit)s
+) page ON TRUE
+"""
+
+NAME_CURSOR_AFTER_SQL = """
+    (-search_rank, name, phone_number)
+    > (-%(after_rank)s::double precision, %(after_name)s, %(after_phone)s)
+"""
+
+
+def _name_matches_sql(params):
+    """
+    Build the matches/ranked CTEs
+    Queries without any word characters cannot form a tsquery, so the
+    word prefix tier is left out for them. The substring tier is left out
+    for queries too short for the trigram index to narrow down.
+    """
+    has_words = bool(params['tsquery'])
+    has_substring = len(params['query']) >= settings.SEARCH_SUBSTRING_MIN_LENGTH
+
+    def candidates(table, source, columns):
+        word_match = WORD_MATCH_SQL.format(table=table) if has_words else 'FALSE'
+        return NAME_CANDIDATES_SQL.format(
+            table=table,
+            source=source,
+            columns=columns,
+            rank=NAME_RANK_SQL.format(table=table, word_match=word_match),
+            word_match=word_match,
+            substring_match=(
+                SUBSTRING_MATCH_SQL.format(table=table) if has_substring else 'FALSE'
+            ),
+        )
+
+    return NAME_MATCHES_SQL.format(
+        user_candidates=candidates(
+            'u', 'users u',
+            'u.name, u.e164 AS phone_number, u.email, TRUE AS is_registered_user'
+        ),
+        contact_candidates=candidates(
+            'c', 'contacts c',
+            'c.name, c.e164 AS phone_number, NULL AS email, FALSE AS is_registered_user'
+        ),
+    )
+
+
+NAME_VECTOR_BACKFILL_SQL = """
+WITH batch AS (
+    SELECT id FROM {table}
+    WHERE {conditions}
+    ORDER BY id
+    LIMIT %(batch_size)s
+)
+UPDATE {table} t
+SET name_search_vector = to_tsvector('simple', coalesce(t.name, ''))
+FROM batch
+WHERE t.id = batch.id
+RETURNING t.id
+"""
+
+
+def backfill_name_search_vectors(table, batch_size=1000, only_missing=False, sleep=0.0):
+    """
+    Recompute name_search_vector of a table's existing rows
+    Walks the primary key with one short transaction per batch, so the
+    table is never locked for long. Returns the number of rows updated.
+    """
+    updated = 0
+    last_id = None
+    while True:
+        conditions = ['TRUE']
+        if last_id is not None:
+            conditions.append('id > %(last_id)s')
+        if only_missing:
+            conditions.append('name_search_vector IS NULL')
+        sql = NAME_VECTOR_BACKFILL_SQL.format(
+            table=table,
+            conditions=' AND '.join(conditions)
+        )
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'batch_size': batch_size,
+                'last_id': last_id,
+            })
+            ids = [row[0] for row in cursor.fetchall()]
+
+        if not ids:
+            return updated
+        updated += len(ids)
+        last_id = max(ids)
+        if sleep:
+            time.sleep(sleep)
+
+
+def _like_escape(value):
+    """Escape LIKE wildcards so user input is matched literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _to_prefix_tsquery(query):
+    """Turn 'john sm' into 'john:* & sm:*' so every word matches as a prefix"""
+    return ' & '.join(f'{word}:*' for word in re.findall(r'[^\W_]+', query))
+
+
+def _name_params(query, limit):
+    query = query.lower()
+    escaped = _like_escape(query)
+    return {
+        'query': query,
+        'tsquery': _to_prefix_tsquery(query),
+        'prefix': f'{escaped}%',
+        'contains': f'%{escaped}%',
+        'candidate_limit': settings.SEARCH_CANDIDATE_LIMIT,
+        'limit': limit,
+    }
+
+
+def _name_row(row):
+    name, phone_number, email, is_registered_user, _, _ = row
+    return {
+        'name': name,
+        'phone_number': phone_number,
+        'email': email,
+        'is_registered_user': is_registered_user,
+    }
+
+
+def normalize_query(query):
+    """
+    Canonical form of a name query
+    Matching is case-insensitive and whitespace runs are collapsed, so
+    every spelling of a query shares one cached result.
+    """
+    return ' '.join(query.lower().split())
+
+
+def search_names(query, page, page_size):
+    """
+    Ranked, deduplicated name search over users and contacts
+    The page is clamped to the last page the way Paginator.get_page does.
+    Totals are capped by SEARCH_CANDIDATE_LIMIT per match tier and source.
+    """
+    params = _name_params(query, page_size)
+    params['offset'] = (page - 1) * page_size
+    with connection.cursor() as cursor:
+        cursor.execute(_name_matches_sql(params) + NAME_PAGE_SQL, params)
+        fetched = cursor.fetchall()
+
+    total = fetched[0][5] if fetched else 0
+    total_pages = max((total + page_size - 1) // page_size, 1)
+    return {
+        'results': [
+            _name_row(row) for row in fetched if row[1] is not None
+        ],
+        'total_pages': total_pages,
+        'current_page': min(page, total_pages),
+        'total_results': total
+    }
+
+
+def search_names_after(query, after, page_size, with_total=False):
+    """
+    Keyset variant of search_names
+    after is the (search_rank, name, phone_number) key of the last row
+    already seen, or None for the first page. The total is only counted
+    when with_total is set.
+    """
+    params = _name_params(query, page_size + 1)
+    sql = _name_matches_sql(params) + NAME_CURSOR_SQL.format(
+        total='(SELECT COUNT(*) FROM ranked)' if with_total else 'NULL::bigint',
+        after=NAME_CURSOR_AFTER_SQL if after else 'TRUE',
+    )
+    if after:
+        params['after_rank'], params['after_name'], params['after_phone'] = after
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        fetched = cursor.fetchall()
+
+    total = fetched[0][5] if fetched else None
+    page = [row for row in fetched if row[1] is not None][:page_size]
+    next_key = None
+    if len(page) == page_size and len(fetched) > page_size:
+        name, phone_number, _, _, search_rank, _ = page[-1]
+        next_key = (search_rank, name, phone_number)
+    return {
+        'results': [_name_row(row) for row in page],
+        'next_key': next_key,
+        'total_results': total
+    }
+
+
+# Caller ID lookup by phone key. The user row, the spam counter and the
+# contact names are joined onto the requested keys so any number of lookups is one
+# round trip, each side probing its BIGINT phone_key index once per number.
+# Contact names are only aggregated for unregistered numbers.
+PHONE_LOOKUP_SQL = """
+SELECT q.phone_key,
+       u.id IS NOT NULL AS is_registered_user,
+       u.name, u.email,
+       s.decayed_reports, s.score_updated_at,
+       summary.primary_name, summary.total_names,
+       COALESCE(page.names, '[]'::json) AS names
+FROM (
+    SELECT DISTINCT unnest(%(phone_keys)s::bigint[]) AS phone_key
+) q
+LEFT JOIN users u ON u.phone_key = q.phone_key
+LEFT JOIN spam_scores s ON s.phone_key = q.phone_key
+LEFT JOIN LATERAL (
+    SELECT min(c.name) AS primary_name, COUNT(DISTINCT c.name) AS total_names
+    FROM contacts c
+    WHERE c.phone_key = q.phone_key AND u.id IS NULL
+) summary ON TRUE
+LEFT JOIN LATERAL (
+    SELECT json_agg(json_build_array(named.name, named.frequency) ORDER BY named.name) AS names
+    FROM (
+        SELECT c.name, COUNT(*) AS frequency
+        FROM contacts c
+        WHERE c.phone_key = q.phone_key AND u.id IS NULL AND {after}
+        GROUP BY c.name
+        ORDER BY c.name
+        LIMIT %(limit)s
+    ) named
+) page ON TRUE
+"""
+
+
+def lookup_phones(phone_numbers, after_name=None, limit=None):
+    """
+    Registered user, spam report weight and contact names for each number
+    Names come with the number of address books that use them, in name
+    order, after after_name and capped at limit when given.
+    Numbers that nobody has registered or saved are left out.
+    """
+    phone_keys = {to_phone_key(n) for n in phone_numbers} - {None}
+    if not phone_keys:
+        return {}
+    sql = PHONE_LOOKUP_SQL.format(
+        after='c.name > %(after_name)s' if after_name else 'TRUE'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'phone_keys': list(phone_keys),
+            'after_name': after_name,
+            'limit': limit,
+        })
+        fetched = cursor.fetchall()
+
+    found = {}
+    now = timezone.now()
+    for (phone_key, is_registered_user, name, email, decayed_reports, score_updated_at,
+         primary_name, total_names, names) in fetched:
+        if not is_registered_user and not total_names:
+            continue
+        found[from_phone_key(phone_key)] = {
+            'is_registered_user': is_registered_user,
+            'name': name if is_registered_user else primary_name,
+            'email': email,
+            'spam_weight': decayed_weight(decayed_reports, score_updated_at, now),
+            'total_names': total_names,
+            'names': [tuple(row) for row in names],
+        }
+    return found
+
+
+def lookup_phone(phone_number, after_name=None, limit=None):
+    """Single number variant of lookup_phones, None when the number is unknown"""
+    return lookup_phones([phone_number], after_name, limit).get(phone_number)
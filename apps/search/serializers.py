@@ -1,7 +1,21 @@
 from rest_framework import serializers
+from django.conf import settings
 from apps.users.models import User
-from apps.contacts.models import Contact
-from apps.spam.models import SpamReport
+
+class SearchResultListSerializer(serializers.ListSerializer):
+    """
+    Resolves email visibility for every registered user on the page
+    in one query before the rows are serialized
+    """
+    def to_representation(self, data):
+        rows = list(data)
+        request = self.context.get('request')
+        if request:
+            self.context['visible_emails'] = User.visible_emails(
+                request.user,
+                (row['phone_number'] for row in rows if row.get('is_registered_user'))
+            )
+        return super().to_representation(rows)
 
 class SearchResultSerializer(serializers.Serializer):
     name = serializers.CharField()
@@ -10,26 +24,44 @@ class SearchResultSerializer(serializers.Serializer):
     is_registered_user = serializers.BooleanField()
     email = serializers.EmailField(allow_null=True, required=False)
 
+    class Meta:
+        list_serializer_class = SearchResultListSerializer
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         request = self.context.get('request')
 
-        # Handle email visibility
+        # Only show email if requester is in user's contacts
         if data.get('is_registered_user') and request:
-            user = User.objects.filter(phone_number=data['phone_number']).first()
-            if user and request.user != user:
-                # Only show email if requester is in user's contacts
-                if not user.contacts.filter(phone_number=request.user.phone_number).exists():
-                    data['email'] = None
+            visible_emails = self.context.get('visible_emails')
+            if visible_emails is None:
+                visible_emails = User.visible_emails(request.user, [data['phone_number']])
+            if not visible_emails.get(data['phone_number']):
+                data['email'] = None
 
         return data
 
 class PhoneSearchResultSerializer(SearchResultSerializer):
     """
     Specific serializer for phone number search results
-    Includes all names associated with the phone number
+    Includes all names associated with the phone number and how many
+    address books use each of them
     """
     associated_names = serializers.ListField(
         child=serializers.CharField(),
         required=False
-    )
\ No newline at end of file
+    )
+    name_frequencies = serializers.DictField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+class PhoneBatchSearchSerializer(serializers.Serializer):
+    """
+    Validates a batch caller ID lookup
+    """
+    phone_numbers = serializers.ListField(
+        child=serializers.CharField(max_length=32),
+        allow_empty=False,
+        max_length=settings.PHONE_BATCH_MAX_NUMBERS
+    )
@@ -0,0 +1,14 @@
+from django.dispatch import receiver
+
+from apps.core.invalidation import cache_invalidated, name_tags, phone_tag
+from .views import search_cache
+
+
+@receiver(cache_invalidated)
+def purge_search_results(sender, phone_numbers, names, **kwargs):
+    """Purge cached searches that can contain a changed number or name"""
+    tags = {phone_tag(n) for n in phone_numbers}
+    for name in names:
+        tags.update(name_tags(name))
+    if tags:
+        search_cache.invalidate(tags)
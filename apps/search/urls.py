@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SearchViewSet
+from .views import SearchViewSet, search_by_phone_async
 
 router = DefaultRouter()
 router.register(r'search', SearchViewSet, basename='search')
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_LOOKUP_VIEWS:
+    urlpatterns = [path('search/phone/', search_by_phone_async, name='search-search-by-phone')] + urlpatterns
@@ -1,27 +1,46 @@
-from django.db.models import Q, Value, CharField, F
-from django.db import models
-from django.db.models.functions import Concat
+import asyncio
+
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.core.paginator import Paginator
-from django.core.cache import cache
-from django.contrib.postgres.search import TrigramSimilarity
-from django.contrib.postgres.search import SearchRank, SearchQuery
-from django.db.models import Prefetch
+from django.conf import settings
 
-from apps.users.models import User
-from apps.contacts.models import Contact
+from apps.core.async_views import async_api_view
 from apps.spam.models import SpamReport
-from .serializers import SearchResultSerializer, PhoneSearchResultSerializer
+from apps.spam.scoring import likelihood
+from apps.core.cache import TaggedCache, hashed_key
+from apps.core.invalidation import phone_tag, query_tag
+from apps.core.pagination import decode_cursor, encode_cursor, wants_total
+from apps.core.phone import to_e164
+from apps.users.models import User
+from .queries import (
+    lookup_phone,
+    lookup_phones,
+    normalize_query,
+    search_names,
+    search_names_after,
+)
+from .serializers import (
+    PhoneBatchSearchSerializer,
+    PhoneSearchResultSerializer,
+    SearchResultSerializer,
+)
+
+search_cache = TaggedCache('search')
+
+
+def phone_cache_key(phone_number):
+    return f'phone_search_{phone_number}'
+
 
 class SearchViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     page_size = 20
     
-    def _paginate_results(self, request, queryset):
-        """Helper method to handle pagination"""
+    def _get_page_number(self, request):
+        """Parse the requested page number, defaulting to the first page"""
         page = request.query_params.get('page', 1)
         try:
             page = int(page)
@@ -29,177 +48,284 @@ class SearchViewSet(viewsets.ViewSet):
                 page = 1
         except ValueError:
             page = 1
-
-        paginator = Paginator(queryset, self.page_size)
-        page_obj = paginator.get_page(page)
-
-        return {
-            'results': page_obj.object_list,
-            'total_pages': paginator.num_pages,
-            'current_page': page,
-            'total_results': paginator.count
-        }
+        return page
+    
+    def _decode_name_cursor(self, cursor):
+        """Decode a name search cursor into its (search_rank, name, phone_number) key"""
+        if not cursor:
+            return None
+        after = decode_cursor(cursor)
+        if (
+            len(after) != 3
+            or not isinstance(after[0], (int, float))
+            or not all(isinstance(value, str) for value in after[1:])
+        ):
+            raise ValueError('Invalid cursor')
+        return after
     
+    def _with_email_visibility(self, response_data, request):
+        """Serialize a shared name search response for the requesting user"""
+        serializer = SearchResultSerializer(
+            response_data['results'],
+            many=True,
+            context={'request': request}
+        )
+        return {**response_data, 'results': serializer.data}
+
     @action(detail=False, methods=['get'], url_path='name')
     def search_by_name(self, request):
         """
         Search by name in both users and contacts with proper prioritization
         """
-        query = request.query_params.get('q', '').strip()
+        query = normalize_query(request.query_params.get('q', ''))
         if not query:
             return Response(
                 {'error': 'Search query is required'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cache_key = f'name_search_{query}_{request.user.id}'
-        cached_results = cache.get(cache_key)
-        if cached_results:
-            return Response(cached_results)
+        cursor = request.query_params.get('cursor')
+        with_total = wants_total(request)
+        if cursor is not None:
+            try:
+                after = self._decode_name_cursor(cursor)
+            except ValueError:
+                return Response(
+                    {'error': 'Invalid cursor'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            cache_key = hashed_key('name_search', query, 'cursor', cursor, with_total)
+        else:
+            page = self._get_page_number(request)
+            cache_key = hashed_key('name_search', query, page)
+
+        # The ranked page is the same for every user, so it is cached once
+        # and only email visibility is applied per request
+        cached_results, versions = search_cache.get(cache_key, [query_tag(query)])
+        if cached_results is not None:
+            return Response(self._with_email_visibility(cached_results, request))
         
-        users = User.objects.filter(
-            Q(name__iexact=query) |
-            Q(name__istartswith=query) |
-            Q(name__icontains=query)
-        ).annotate(
-            search_rank=models.Case(
-                models.When(name__iexact=query, then=models.Value(1.0)),
-                models.When(name__istartswith=query, then=models.Value(0.8)),
-                models.When(name__icontains=query, then=models.Value(0.6)),
-                default=models.Value(0.0),
-                output_field=models.FloatField(),
+        if cursor is not None:
+            paginated_data = search_names_after(
+                query, after, self.page_size, with_total
             )
-        ).prefetch_related(
-            Prefetch('contacts', queryset=Contact.objects.filter(user=request.user))
-        )
+        else:
+            paginated_data = search_names(query, page, self.page_size)
 
-        # Search in Contacts
-        contacts = Contact.objects.filter(
-            Q(name__iexact=query) |
-            Q(name__istartswith=query) |
-            Q(name__icontains=query)
-        ).annotate(
-            search_rank=models.Case(
-                models.When(name__iexact=query, then=models.Value(1.0)),
-                models.When(name__istartswith=query, then=models.Value(0.8)),
-                models.When(name__icontains=query, then=models.Value(0.6)),
-                default=models.Value(0.0),
-                output_field=models.FloatField(),
-            )
+        # Tag the entry with every number on the page, reading the tags
+        # before scoring so a report filed meanwhile still purges it
+        tags = [query_tag(query)] + [
+            phone_tag(result['phone_number']) for result in paginated_data['results']
+        ]
+        versions.update(search_cache.versions(tags[1:]))
+
+        # Score only the rows on this page, in one batch
+        spam_likelihoods = SpamReport.get_spam_likelihoods(
+            result['phone_number'] for result in paginated_data['results']
         )
+        for result in paginated_data['results']:
+            result['spam_likelihood'] = spam_likelihoods[result['phone_number']]
 
-        # Combine and prioritize results
-        results = []
-        seen_numbers = set()
-
-        def add_result(name, phone_number, is_registered_user=False, email=None):
-            if phone_number in seen_numbers:
-                return
-            seen_numbers.add(phone_number)
-            
-            spam_likelihood = SpamReport.get_spam_likelihood(phone_number)
-            results.append({
-                'name': name,
-                'phone_number': phone_number,
-                'spam_likelihood': spam_likelihood,
-                'is_registered_user': is_registered_user,
-                'email': email
-            })
-
-        # Process results in priority order
-        for user in users.order_by('-search_rank'):
-            add_result(user.name, user.phone_number, True, user.email)
-
-        for contact in contacts.order_by('-search_rank'):
-            add_result(contact.name, contact.phone_number)
-
-        # Paginate results
-        paginated_data = self._paginate_results(request, results)
-        
-        serializer = SearchResultSerializer(
-            paginated_data['results'], 
-            many=True,
-            context={'request': request}
+        if cursor is not None:
+            next_key = paginated_data['next_key']
+            response_data = {
+                'results': paginated_data['results'],
+                'next_cursor': encode_cursor(next_key) if next_key else None
+            }
+            if with_total:
+                response_data['total_results'] = paginated_data['total_results']
+        else:
+            response_data = {
+                'results': paginated_data['results'],
+                'total_pages': paginated_data['total_pages'],
+                'current_page': paginated_data['current_page'],
+                'total_results': paginated_data['total_results']
+            }
+
+        search_cache.set(
+            cache_key, response_data, tags, versions, settings.SEARCH_CACHE_TIMEOUT
         )
 
-        response_data = {
-            'results': serializer.data,
-            'total_pages': paginated_data['total_pages'],
-            'current_page': paginated_data['current_page'],
-            'total_results': paginated_data['total_results']
+        return Response(self._with_email_visibility(response_data, request))
+
+    def _phone_result(self, phone_number, found, names=None):
+        """Shared, user independent search result for a number found by lookup_phones"""
+        result = {
+            'name': found['name'],
+            'phone_number': phone_number,
+            'spam_likelihood': likelihood(found['spam_weight']),
+            'is_registered_user': found['is_registered_user'],
         }
+        if found['is_registered_user']:
+            result['email'] = found['email']
+        else:
+            names = found['names'] if names is None else names
+            result['associated_names'] = [name for name, _ in names]
+            result['name_frequencies'] = dict(names)
+        return result
+
+    def _phone_response(self, result, request, visible_emails=None):
+        """Serialize a shared phone search result for the requesting user"""
+        response_data = PhoneSearchResultSerializer(
+            result,
+            context={'request': request, 'visible_emails': visible_emails}
+        ).data
+        for key in ('next_cursor', 'total_names'):
+            if key in result:
+                response_data[key] = result[key]
+        return response_data
+
+    def _phone_search_params(self, request):
+        """
+        Read a phone search request
+        Returns (phone_number, cursor, with_total, after_name) and raises
+        ValueError with the error to answer with when the request is invalid.
+        """
+        phone_number = request.query_params.get('q', '').strip()
+        if not phone_number:
+            raise ValueError('Phone number is required')
+
+        phone_number = to_e164(phone_number)
+        if phone_number is None:
+            raise ValueError('Invalid phone number')
+
+        # Cursor mode pages through associated_names in name order
+        cursor = request.query_params.get('cursor')
+        after_name = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+                if len(after) != 1 or not isinstance(after[0], str):
+                    raise ValueError('Invalid cursor')
+            except ValueError:
+                raise ValueError('Invalid cursor')
+            after_name = after[0]
+        return phone_number, cursor, wants_total(request), after_name
 
-        # Cache results for 5 minutes
-        cache.set(cache_key, response_data, 300)
+    @staticmethod
+    def _phone_search_cache_key(phone_number, cursor, with_total):
+        if cursor is not None:
+            return hashed_key('phone_search', phone_number, 'cursor', cursor, with_total)
+        return phone_cache_key(phone_number)
 
-        return Response(response_data)
+    def _phone_search_limit(self, cursor):
+        return self.page_size + 1 if cursor is not None else None
+
+    def _phone_search_result(self, phone_number, found, cursor, with_total):
+        """Shared result of a phone search, with a page of names in cursor mode"""
+        if cursor is not None and not found['is_registered_user']:
+            names = found['names'][:self.page_size]
+            result = self._phone_result(phone_number, found, names)
+            has_next = len(found['names']) > self.page_size
+            result['next_cursor'] = encode_cursor([names[-1][0]]) if has_next else None
+            if with_total:
+                result['total_names'] = found['total_names']
+            return result
+        return self._phone_result(phone_number, found)
 
     @action(detail=False, methods=['get'], url_path='phone')
     def search_by_phone(self, request):
         """
         Search by phone number with proper handling of registered users
         """
-        phone_number = request.query_params.get('q', '').strip()
-        if not phone_number:
+        try:
+            phone_number, cursor, with_total, after_name = self._phone_search_params(request)
+        except ValueError as e:
             return Response(
-                {'error': 'Phone number is required'}, 
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        phone_number = phone_number.strip().replace(" ", "")
-        if not phone_number.startswith('+'):
-            phone_number = '+' + phone_number
-
-        cache_key = f'phone_search_{phone_number}_{request.user.id}'
-        cached_result = cache.get(cache_key)
-        if cached_result:
-            return Response(cached_result)
-
-        # Check for registered user first
-        registered_user = User.objects.filter(
-            phone_number=phone_number
-        ).prefetch_related(
-            Prefetch('contacts', queryset=Contact.objects.filter(user=request.user))
-        ).first()
-
-        if registered_user:
-            result = {
-                'name': registered_user.name,
-                'phone_number': registered_user.phone_number,
-                'spam_likelihood': SpamReport.get_spam_likelihood(phone_number),
-                'is_registered_user': True,
-                'email': registered_user.email
-            }
-            serializer = PhoneSearchResultSerializer(
-                result,
-                context={'request': request}
-            )
-            response_data = serializer.data
-            cache.set(cache_key, response_data, 300)
-            return Response(response_data)
 
-        # If no registered user, get all contact entries
-        contacts = Contact.objects.filter(
-            phone_number=phone_number
-        ).select_related('user')
+        cache_key = self._phone_search_cache_key(phone_number, cursor, with_total)
+        tags = [phone_tag(phone_number)]
+        cached_result, versions = search_cache.get(cache_key, tags)
+        if cached_result is not None:
+            return Response(self._phone_response(cached_result, request))
 
-        if not contacts.exists():
+        found = lookup_phone(phone_number, after_name, self._phone_search_limit(cursor))
+        if found is None:
             return Response([], status=status.HTTP_200_OK)
-        
-        contact_names = list(contacts.values_list('name', flat=True).distinct())
-        
-        result = {
-            'name': contact_names[0],  # Primary name
-            'phone_number': phone_number,
-            'spam_likelihood': SpamReport.get_spam_likelihood(phone_number),
-            'is_registered_user': False,
-            'associated_names': contact_names
-        }
-        
-        serializer = PhoneSearchResultSerializer(
-            result,
+
+        result = self._phone_search_result(phone_number, found, cursor, with_total)
+        search_cache.set(
+            cache_key, result, tags, versions, settings.SEARCH_CACHE_TIMEOUT
+        )
+        return Response(self._phone_response(result, request))
+
+    @action(detail=False, methods=['post'], url_path='phone/batch')
+    def search_by_phone_batch(self, request):
+        """
+        Caller ID lookup for many numbers in one request
+        Returns a map keyed by normalized number, null for unknown numbers.
+        Each number shares its cache entry with the single number search.
+        """
+        serializer = PhoneBatchSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Input without any digits is echoed back with a null result
+        phone_numbers = list(dict.fromkeys(
+            to_e164(phone_number) or phone_number
+            for phone_number in serializer.validated_data['phone_numbers']
+        ))
+        cache_keys = {phone_cache_key(n): n for n in phone_numbers}
+        tags_by_key = {key: [phone_tag(n)] for key, n in cache_keys.items()}
+        hits, versions = search_cache.get_many(
+            cache_keys, [tags[0] for tags in tags_by_key.values()]
+        )
+        results = {cache_keys[key]: result for key, result in hits.items()}
+
+        missing = [n for n in phone_numbers if n not in results]
+        if missing:
+            fresh = {
+                phone_number: self._phone_result(phone_number, found)
+                for phone_number, found in lookup_phones(missing).items()
+            }
+            search_cache.set_many(
+                {phone_cache_key(n): result for n, result in fresh.items()},
+                tags_by_key,
+                versions,
+                settings.SEARCH_CACHE_TIMEOUT
+            )
+            results.update(fresh)
+
+        serialized = PhoneSearchResultSerializer(
+            [results[n] for n in phone_numbers if n in results],
+            many=True,
             context={'request': request}
+        ).data
+        by_number = {row['phone_number']: row for row in serialized}
+        return Response({n: by_number.get(n) for n in phone_numbers})
+
+
+@async_api_view
+async def search_by_phone_async(request):
+    """
+    search_by_phone for ASGI deployments
+    What the requester may see of a registered user's email does not
+    depend on the search result, so it is read alongside the cache.
+    """
+    search = SearchViewSet()
+    try:
+        phone_number, cursor, with_total, after_name = search._phone_search_params(request)
+    except ValueError as e:
+        return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+
+    cache_key = search._phone_search_cache_key(phone_number, cursor, with_total)
+    tags = [phone_tag(phone_number)]
+    (result, versions), visible_emails = await asyncio.gather(
+        search_cache.aget(cache_key, tags),
+        User.avisible_emails(request.user, [phone_number])
+    )
+    if result is None:
+        # Django has no async cursor for the raw lookup query
+        found = await sync_to_async(lookup_phone)(
+            phone_number, after_name, search._phone_search_limit(cursor)
+        )
+        if found is None:
+            return [], status.HTTP_200_OK
+        result = search._phone_search_result(phone_number, found, cursor, with_total)
+        await search_cache.aset(
+            cache_key, result, tags, versions, settings.SEARCH_CACHE_TIMEOUT
         )
-        response_data = serializer.data
-        cache.set(cache_key, response_data, 300)
-        return Response(response_data)
\ No newline at end of file
+    return search._phone_response(result, request, visible_emails), status.HTTP_200_OK
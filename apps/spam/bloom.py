@@ -0,0 +1,322 @@
+"""
+Per-worker Bloom filter of the phone keys that have been reported.
+Most caller ID lookups are for numbers nobody has reported. A key the
+filter has never seen is a definite negative and needs neither the cache
+nor the database. A hit only means "maybe" and takes the normal path.
+
+Workers load the filter from a snapshot in the spam cache. Every committed
+report is also appended to a short log in the same cache, and workers
+replay the log every SPAM_FILTER_SYNC_SECONDS, so another worker's report
+is seen within that delay. Retracted numbers stay in the filter as false
+positives until the snapshot is rebuilt from spam_scores.
+
+Rebuilding walks all of spam_scores, so it never runs inside a lookup. It
+runs in rebuild_spam_filter, or in a background thread of the first worker
+to find the snapshot missing or stale.
+
+The cache can outlive the database it describes, for example a file cache
+across test runs or a restored dump, so every shared key is scoped to the
+current database and a recreated database never reads an old snapshot.
+"""
+import fcntl
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection, transaction
+
+
+def database_generation():
+    """Name and oid of the current database, which change when it is recreated"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT current_database() || \'_\' || oid FROM pg_database '
+            'WHERE datname = current_database()'
+        )
+        return cursor.fetchone()[0]
+
+
+def snapshot_key(generation):
+    return f'reported_filter_{generation}'
+
+
+def sequence_key(generation):
+    return f'reported_filter_seq_{generation}'
+
+
+def build_lock_key(generation):
+    return f'reported_filter_build_{generation}'
+
+
+def log_key(generation, seq):
+    return f'reported_filter_log_{generation}_{seq}'
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over integer phone keys
+    Sized for capacity keys at error_rate false positives, with k probe
+    positions derived from one blake2b digest by double hashing.
+    """
+    header = struct.Struct('<QI')
+
+    def __init__(self, size, hash_count, bits=None):
+        self.size = size
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        # Setting a bit is a read-modify-write of its byte
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hash_count)
+
+    @classmethod
+    def from_bytes(cls, data):
+        size, hash_count = cls.header.unpack_from(data)
+        return cls(size, hash_count, bytearray(data[cls.header.size:]))
+
+    def to_bytes(self):
+        return self.header.pack(self.size, self.hash_count) + bytes(self.bits)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.to_bytes(8, 'little', signed=True), digest_size=16).digest()
+        first, second = struct.unpack('<QQ', digest)
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, key):
+        positions = list(self._positions(key))
+        with self.lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+def build_snapshot(generation=None):
+    """
+    Build a filter of every number with active reports and share it
+    Reports are logged after they commit, so reading the log position
+    before spam_scores means every report is either in the snapshot or
+    replayed on top of it.
+    """
+    from .models import SpamScore
+
+    if generation is None:
+        generation = database_generation()
+    cache = caches['spam']
+    seq = cache.get(sequence_key(generation), 0)
+    bloom = BloomFilter.for_capacity(
+        settings.SPAM_FILTER_CAPACITY,
+        settings.SPAM_FILTER_ERROR_RATE
+    )
+    phone_keys = SpamScore.objects.filter(
+        active_reports__gt=0
+    ).values_list('phone_key', flat=True)
+    for phone_key in phone_keys.iterator(chunk_size=10000):
+        bloom.add(phone_key)
+    snapshot = {'seq': seq, 'built_at': time.time(), 'filter': bloom.to_bytes()}
+    cache.set(snapshot_key(generation), snapshot, timeout=None)
+    return snapshot
+
+
+class ReportedNumbers:
+    """
+    This worker's view of the reported phone keys
+    Lookups fall back to "maybe" whenever the filter is missing or may
+    have missed a report, so a stale filter costs queries, never answers.
+    """
+    def __init__(self):
+        self.bloom = None
+        self.generation = None
+        # Reported in this worker but not committed, so not in the log yet
+        self.pending = set()
+        self.seq = 0
+        self.loaded_at = 0
+        self.synced_at = 0
+        self.hole = None
+        # Snapshots from before an expired log entry cannot catch up
+        self.expired_seq = 0
+        self.lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches['spam']
+
+    def might_be_reported(self, phone_key, sync=True):
+        """
+        False only when phone_key has definitely never been reported
+        Async callers pass sync=False after running refresh in a thread,
+        as loading a snapshot queries the database.
+        """
+        if phone_key is None:
+            # Numbers without a phone key cannot be reported
+            return False
+        if not settings.SPAM_FILTER_ENABLED:
+            return True
+        if sync:
+            self.refresh()
+        bloom = self.bloom
+        return bloom is None or phone_key in bloom
+
+    def add(self, phone_keys):
+        """
+        Record reports in this worker now and in the shared log once they commit
+        Must run inside the reports' transaction. Snapshots cannot see the
+        reports before they commit, so until then their keys are also added
+        to every filter this worker loads. A rolled back report is left
+        behind as one more false positive.
+        """
+        if not settings.SPAM_FILTER_ENABLED:
+            return
+        phone_keys = list(phone_keys)
+        self.pending.update(phone_keys)
+        bloom = self.bloom
+        if bloom is not None:
+            for phone_key in phone_keys:
+                bloom.add(phone_key)
+        transaction.on_commit(lambda: self._log(phone_keys))
+
+    def _log(self, phone_keys):
+        """Append committed reports to the shared log"""
+        generation = self._generation()
+        for phone_key in phone_keys:
+            seq = self._next_seq(generation)
+            self.cache.set(
+                log_key(generation, seq), phone_key, timeout=settings.SPAM_FILTER_LOG_TIMEOUT
+            )
+        self.pending.difference_update(phone_keys)
+
+    def _generation(self):
+        if self.generation is None:
+            self.generation = database_generation()
+        return self.generation
+
+    def _next_seq(self, generation):
+        """Allocate the next log position"""
+        cache = self.cache
+        if not isinstance(cache, FileBasedCache):
+            return self._incr(cache, generation)
+        # incr is a read then a write on files, so the workers of a host,
+        # which are all that share this cache, allocate under a file lock
+        with open(os.path.join(cache._dir, 'reported_filter.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            return self._incr(cache, generation)
+
+    @staticmethod
+    def _incr(cache, generation):
+        try:
+            return cache.incr(sequence_key(generation))
+        except ValueError:
+            cache.add(sequence_key(generation), 0, timeout=None)
+            return cache.incr(sequence_key(generation))
+
+    def warm(self):
+        """
+        Load the filter when a worker starts
+        Lookups fall back to the database until a later sync succeeds if
+        the cache or the database is not reachable yet.
+        """
+        try:
+            self.refresh(force=True)
+        except Exception:
+            self.bloom = None
+
+    def refresh(self, force=False):
+        """Replay the shared log, reloading the snapshot when it is due"""
+        now = time.monotonic()
+        if not force and now - self.synced_at < settings.SPAM_FILTER_SYNC_SECONDS:
+            return
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.synced_at = now
+            if self.bloom is None or now - self.loaded_at >= settings.SPAM_FILTER_REFRESH_SECONDS:
+                self._load()
+            elif not self._replay(self.bloom):
+                # A log entry expired before it was replayed, lookups go to
+                # the database until a snapshot past it has been built
+                self.expired_seq = self.hole
+                self.bloom = None
+                self._load()
+        finally:
+            self.lock.release()
+
+    def _load(self):
+        generation = database_generation()
+        if generation != self.generation:
+            # Nothing loaded so far describes this database
+            self.generation = generation
+            self.bloom = None
+            self.expired_seq = 0
+        snapshot = self.cache.get(snapshot_key(generation))
+        if snapshot is None or snapshot['seq'] < self.expired_seq:
+            self._build_in_background(generation)
+            return
+        if time.time() - snapshot['built_at'] >= settings.SPAM_FILTER_MAX_AGE:
+            # Still correct, only carrying more retracted numbers
+            self._build_in_background(generation)
+        # Lookups keep the current filter until the new one has caught up
+        bloom = BloomFilter.from_bytes(snapshot['filter'])
+        self.seq = snapshot['seq']
+        self.hole = None
+        if not self._replay(bloom):
+            self.bloom = None
+        else:
+            self.bloom = bloom
+            # After the swap, so a report added meanwhile lands in one or the other
+            for phone_key in list(self.pending):
+                bloom.add(phone_key)
+        self.loaded_at = time.monotonic()
+
+    def _build_in_background(self, generation):
+        """Rebuild the shared snapshot off the request path, one worker at a time"""
+        lock_key = build_lock_key(generation)
+        if self.cache.add(lock_key, 1, timeout=settings.SPAM_FILTER_BUILD_TIMEOUT):
+            threading.Thread(target=self._build, args=(generation, lock_key), daemon=True).start()
+
+    def _build(self, generation, lock_key):
+        try:
+            build_snapshot(generation)
+        finally:
+            self.cache.delete(lock_key)
+            connection.close()
+
+    def _replay(self, bloom):
+        """Add logged reports newer than self.seq to bloom, False when some have expired"""
+        generation = self.generation
+        latest = self.cache.get(sequence_key(generation), 0)
+        if latest <= self.seq:
+            return True
+        logged = self.cache.get_many(
+            [log_key(generation, seq) for seq in range(self.seq + 1, latest + 1)]
+        )
+        for seq in range(self.seq + 1, latest + 1):
+            phone_key = logged.get(log_key(generation, seq))
+            if phone_key is None:
+                # The entry may still be being written, it has expired
+                # only if it is still missing on the next sync
+                if self.hole == seq:
+                    return False
+                self.hole = seq
+                return True
+            bloom.add(phone_key)
+            self.seq = seq
+        self.hole = None
+        return True
+
+
+reported_numbers = ReportedNumbers()
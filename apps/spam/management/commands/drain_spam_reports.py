@@ -0,0 +1,84 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.phone import to_e164, to_phone_key
+from apps.spam.models import SpamReport, SpamReportOutbox, SpamScore
+
+
+class Command(BaseCommand):
+    help = 'Insert and count the spam reports queued while SPAM_REPORT_QUEUE_ENABLED is set'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SPAM_REPORT_QUEUE_BATCH_SIZE,
+            help='Number of queued reports drained per transaction'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=0,
+            help='Keep running, checking an empty queue every this many seconds'
+        )
+
+    def handle(self, *args, **options):
+        queued = created = 0
+        while True:
+            drained, inserted = self._drain(options['batch_size'])
+            queued += drained
+            created += inserted
+            if drained:
+                continue
+            if not options['poll']:
+                break
+            time.sleep(options['poll'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Drained {queued} queued reports: {created} created, '
+            f'{queued - created} were duplicates'
+        ))
+
+    def _drain(self, batch_size):
+        """
+        Move one batch from the outbox into spam_reports
+        Locked rows are skipped so several drainers can run side by side.
+        Reports are timestamped when they are drained.
+        """
+        with transaction.atomic():
+            queued = list(
+                SpamReportOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+            if not queued:
+                return 0, 0
+            # Keep the first queued report of each number by each user,
+            # however the number was typed
+            reports = {}
+            for item in queued:
+                e164 = to_e164(item.phone_number)
+                phone_key = to_phone_key(e164)
+                reports.setdefault((item.reporter_id, phone_key), SpamReport(
+                    id=item.report_id,
+                    reporter_id=item.reporter_id,
+                    phone_number=item.phone_number,
+                    e164=e164,
+                    phone_key=phone_key,
+                    is_active=True
+                ))
+            already_reported = set(SpamReport.objects.filter(
+                reporter_id__in={reporter_id for reporter_id, _ in reports},
+                phone_key__in={phone_key for _, phone_key in reports},
+                is_active=True
+            ).values_list('reporter_id', 'phone_key'))
+            reports = [
+                report for key, report in reports.items() if key not in already_reported
+            ]
+            # A report made directly since the check hits unique_active_report
+            SpamReport.objects.bulk_create(reports, ignore_conflicts=True)
+            created = list(SpamReport.objects.filter(id__in=[report.id for report in reports]))
+            SpamScore.record_reports(created)
+            SpamReportOutbox.objects.filter(id__in=[item.id for item in queued]).delete()
+        return len(queued), len(created)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.spam.bloom import BloomFilter, build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the shared reported numbers filter snapshot from spam_scores'
+
+    def handle(self, *args, **options):
+        snapshot = build_snapshot()
+        bloom = BloomFilter.from_bytes(snapshot['filter'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Built a {len(snapshot["filter"]) / 2 ** 20:.1f} MiB filter with '
+            f'{bloom.hash_count} hashes at log position {snapshot["seq"]}'
+        ))
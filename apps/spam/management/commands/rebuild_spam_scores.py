@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from apps.core.invalidation import publish
+from apps.core.phone import from_phone_key
+from apps.spam.models import SpamReport, SpamScore
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the spam_scores aggregate table from spam_reports and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of phone numbers reconciled per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing any changes'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        recent_since = timezone.now() - SpamScore.RECENT_WINDOW
+
+        aggregates = SpamReport.objects.filter(
+            is_active=True,
+            phone_key__isnull=False
+        ).values('phone_key').annotate(
+            active_reports=Count('id'),
+            recent_reports=Count('id', filter=Q(reported_at__gte=recent_since)),
+            last_reported_at=Max('reported_at')
+        ).order_by('phone_key')
+
+        checked = repaired = 0
+        batch = []
+        for row in aggregates.iterator(chunk_size=batch_size):
+            row['phone_number'] = from_phone_key(row['phone_key'])
+            batch.append(row)
+            if len(batch) >= batch_size:
+                repaired += self._reconcile(batch, dry_run)
+                checked += len(batch)
+                batch = []
+        if batch:
+            repaired += self._reconcile(batch, dry_run)
+            checked += len(batch)
+
+        stale = SpamScore.objects.exclude(
+            phone_key__in=SpamReport.objects.filter(
+                is_active=True,
+                phone_key__isnull=False
+            ).values('phone_key')
+        )
+        stale_numbers = list(stale.values_list('phone_number', flat=True))
+        if stale_numbers and not dry_run:
+            stale.delete()
+            publish(phone_numbers=stale_numbers)
+
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} numbers: {repaired} scores {verb} repaired, '
+            f'{len(stale_numbers)} stale scores {verb} removed'
+        ))
+
+    def _reconcile(self, rows, dry_run):
+        """Upsert the scores in rows that differ from what is stored"""
+        phone_keys = [row['phone_key'] for row in rows]
+        current = {
+            score.phone_key: score
+            for score in SpamScore.objects.filter(phone_key__in=phone_keys)
+        }
+
+        drifted = []
+        for row in rows:
+            score = current.get(row['phone_key'])
+            if (
+                score is None
+                or score.active_reports != row['active_reports']
+                or score.recent_reports != row['recent_reports']
+                or score.last_reported_at != row['last_reported_at']
+            ):
+                score_fields = {}
+                if score is None:
+                    # Seeded like the decayed_reports migration, the
+                    # exact weight comes from recompute_spam_scores
+                    score_fields = {
+                        'decayed_reports': row['active_reports'],
+                        'score_updated_at': row['last_reported_at'],
+                    }
+                drifted.append(SpamScore(updated_at=timezone.now(), **score_fields, **row))
+
+        if drifted and not dry_run:
+            with transaction.atomic():
+                SpamScore.objects.bulk_create(
+                    drifted,
+                    update_conflicts=True,
+                    unique_fields=['phone_key'],
+                    update_fields=[
+                        'phone_number',
+                        'active_reports',
+                        'recent_reports',
+                        'last_reported_at',
+                        'updated_at'
+                    ]
+                )
+                publish(phone_numbers=[s.phone_number for s in drifted])
+        return len(drifted)
@@ -0,0 +1,129 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.core.invalidation import publish
+from apps.spam import scoring
+
+# Active reports in phone key order, read off spam_report_active_phone_idx
+REPORTS_SQL = """
+SELECT phone_key, EXTRACT(EPOCH FROM reported_at)::float8
+FROM spam_reports
+WHERE is_active AND phone_key IS NOT NULL
+ORDER BY phone_key
+"""
+
+# Rows touched by a report or retraction since the recompute started
+# already carry those changes and are left alone. The drift is what the
+# stored weight was off by, so only numbers that moved are invalidated.
+UPDATE_SQL = """
+UPDATE spam_scores s
+SET decayed_reports = v.weight, score_updated_at = %(now)s
+FROM unnest(%(phone_keys)s::bigint[], %(weights)s::float8[]) AS v(phone_key, weight),
+     spam_scores old
+WHERE s.phone_key = v.phone_key
+  AND old.phone_key = v.phone_key
+  AND (s.score_updated_at IS NULL OR s.score_updated_at <= %(now)s)
+RETURNING s.phone_number, abs(
+    COALESCE(old.decayed_reports * power(
+        0.5, GREATEST(EXTRACT(EPOCH FROM %(now)s - old.score_updated_at), 0)::float8 / %(half_life)s
+    ), 0) - v.weight
+)
+"""
+
+CLEAR_SQL = """
+UPDATE spam_scores s
+SET decayed_reports = 0, score_updated_at = %(now)s
+WHERE s.decayed_reports > 0
+  AND (s.score_updated_at IS NULL OR s.score_updated_at <= %(now)s)
+  AND NOT EXISTS (
+      SELECT 1 FROM spam_reports r WHERE r.phone_key = s.phone_key AND r.is_active
+  )
+RETURNING s.phone_number
+"""
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed spam scores from the full report log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100000,
+            help='Number of reports read and summed per batch'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.01,
+            help='Weight drift below which a number is not invalidated'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        tolerance = options['tolerance']
+        half_life = scoring.half_life_seconds()
+        numbers = drifted = 0
+        # The last number of a batch may continue in the next one
+        carry_key, carry_weight = None, 0.0
+
+        # Outside a transaction the cursor is held across the batch
+        # commits, so reports are not locked out for the whole run
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(REPORTS_SQL)
+            while True:
+                rows = cursor.fetchmany(options['batch_size'])
+                if not rows and carry_key is None:
+                    break
+                if rows:
+                    phone_keys = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+                    reported_at = np.fromiter((row[1] for row in rows), np.float64, len(rows))
+                    ages = np.maximum(now.timestamp() - reported_at, 0)
+                    phone_keys, groups = np.unique(phone_keys, return_inverse=True)
+                    weights = np.bincount(groups, weights=0.5 ** (ages / half_life))
+                else:
+                    phone_keys = np.empty(0, dtype=np.int64)
+                    weights = np.empty(0)
+                if carry_key is not None:
+                    if len(phone_keys) and phone_keys[0] == carry_key:
+                        weights[0] += carry_weight
+                    else:
+                        phone_keys = np.insert(phone_keys, 0, carry_key)
+                        weights = np.insert(weights, 0, carry_weight)
+                if rows:
+                    carry_key, carry_weight = phone_keys[-1], weights[-1]
+                    phone_keys, weights = phone_keys[:-1], weights[:-1]
+                else:
+                    carry_key = None
+                if len(phone_keys):
+                    numbers += len(phone_keys)
+                    drifted += self._write(phone_keys, weights, now, half_life, tolerance)
+
+        with connection.cursor() as cursor:
+            cursor.execute(CLEAR_SQL, {'now': now})
+            cleared = [phone_number for phone_number, in cursor.fetchall()]
+        if cleared:
+            publish(phone_numbers=cleared)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {numbers} scores: {drifted} had drifted, {len(cleared)} were cleared'
+        ))
+
+    def _write(self, phone_keys, weights, now, half_life, tolerance):
+        """Store one batch of weights, invalidating the numbers that drifted"""
+        with connection.cursor() as cursor:
+            cursor.execute(UPDATE_SQL, {
+                'now': now,
+                'half_life': half_life,
+                'phone_keys': phone_keys.tolist(),
+                'weights': weights.tolist(),
+            })
+            drifted = [
+                phone_number for phone_number, drift in cursor.fetchall()
+                if drift > tolerance
+            ]
+        if drifted:
+            publish(phone_numbers=drifted)
+        return len(drifted)
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from apps.core.phone import from_phone_key
+from apps.spam.models import SpamLikelihoodBucket, SpamReport, SpamTopNumber
+from apps.spam.queries import likelihood_distribution
+
+REBUILD_HOURLY_SQL = """
+INSERT INTO spam_report_hourly (hour_bucket, reports, retractions)
+SELECT date_trunc('hour', reported_at), COUNT(*), COUNT(*) FILTER (WHERE NOT is_active)
+FROM spam_reports
+GROUP BY 1
+"""
+
+
+class Command(BaseCommand):
+    help = 'Refresh the spam statistics rollups read by /api/spam/statistics/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-hourly',
+            action='store_true',
+            help='Also recount the hourly report rollup from spam_reports'
+        )
+
+    def handle(self, *args, **options):
+        top_numbers = [
+            SpamTopNumber(
+                rank=rank,
+                phone_number=from_phone_key(row['phone_key']),
+                report_count=row['report_count']
+            )
+            for rank, row in enumerate(
+                SpamReport.objects.filter(
+                    is_active=True,
+                    phone_key__isnull=False
+                ).values('phone_key').annotate(
+                    report_count=Count('id')
+                ).order_by('-report_count')[:settings.SPAM_STATISTICS_TOP_NUMBERS],
+                start=1
+            )
+        ]
+
+        buckets = [
+            SpamLikelihoodBucket(name=name, numbers=numbers)
+            for name, numbers in likelihood_distribution().items()
+        ]
+
+        with transaction.atomic():
+            SpamTopNumber.objects.all().delete()
+            SpamTopNumber.objects.bulk_create(top_numbers)
+            SpamLikelihoodBucket.objects.all().delete()
+            SpamLikelihoodBucket.objects.bulk_create(buckets)
+
+        if options['rebuild_hourly']:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('LOCK TABLE spam_report_hourly IN EXCLUSIVE MODE')
+                cursor.execute('DELETE FROM spam_report_hourly')
+                cursor.execute(REBUILD_HOURLY_SQL)
+                hours = cursor.rowcount
+            self.stdout.write(f'Recounted {hours} hourly buckets')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {len(top_numbers)} top numbers and {len(buckets)} likelihood buckets'
+        ))
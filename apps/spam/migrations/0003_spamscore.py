@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("spam", "0002_alter_spamreport_unique_together_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SpamScore",
+            fields=[
+                (
+                    "phone_number",
+                    models.CharField(max_length=17, primary_key=True, serialize=False),
+                ),
+                ("active_reports", models.PositiveIntegerField(default=0)),
+                ("recent_reports", models.PositiveIntegerField(default=0)),
+                ("last_reported_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "spam_scores",
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO spam_scores (phone_number, active_reports, recent_reports, last_reported_at, updated_at)
+            SELECT phone_number, COUNT(*),
+                   COUNT(*) FILTER (WHERE reported_at >= now() - interval '30 days'),
+                   MAX(reported_at), now()
+            FROM spam_reports
+            WHERE is_active
+            GROUP BY 1
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
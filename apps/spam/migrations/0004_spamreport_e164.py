@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:45
+
+import re
+
+import phonenumbers
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+
+NON_DIGITS_RE = re.compile(r"\D")
+
+
+def to_e164(raw, region):
+    """apps.core.phone.to_e164 as of this migration"""
+    if raw is None:
+        return None
+    raw = raw.strip()
+    digits = NON_DIGITS_RE.sub("", raw)
+    if not digits:
+        return None
+    if raw.startswith("+"):
+        raw, region = "+" + digits, None
+    elif not region:
+        return None
+    try:
+        number = phonenumbers.parse(raw, region)
+    except phonenumbers.NumberParseException:
+        return "+" + digits
+    if not phonenumbers.is_possible_number(number):
+        return "+" + digits
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def fill_e164(apps, schema_editor):
+    """Fill e164 of existing rows in primary key batches, one transaction each"""
+    model = apps.get_model("spam", "SpamReport")
+    region = getattr(settings, "PHONE_DEFAULT_REGION", None)
+    last_pk = None
+    while True:
+        rows = model.objects.filter(e164__isnull=True).order_by("pk")
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        batch = list(rows.only("pk", "phone_number")[:1000])
+        if not batch:
+            return
+        for row in batch:
+            row.e164 = to_e164(row.phone_number, region)
+        with transaction.atomic():
+            model.objects.bulk_update(batch, ["e164"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Backfill batches commit one by one and the index is built concurrently
+    atomic = False
+
+    dependencies = [
+        ("spam", "0003_spamscore"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="spamreport",
+            name="e164",
+            field=models.CharField(editable=False, max_length=17, null=True),
+        ),
+        migrations.RunPython(fill_e164, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="spamreport",
+            index=models.Index(fields=["e164"], name="spam_report_e164_f55bae_idx"),
+        ),
+    ]
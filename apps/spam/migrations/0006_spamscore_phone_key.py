@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Scores move to the integer phone key. They are regrouped from the
+    # reports' keys, so the same number reported in different formats
+    # merges into one score and numbers without a key are dropped.
+    dependencies = [
+        ("spam", "0005_spamreport_phone_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="spamscore",
+            name="phone_key",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunSQL(
+            """
+            DELETE FROM spam_scores;
+            INSERT INTO spam_scores (phone_number, phone_key, active_reports, recent_reports, last_reported_at, updated_at)
+            SELECT '+' || phone_key, phone_key, COUNT(*),
+                   COUNT(*) FILTER (WHERE reported_at >= now() - interval '30 days'),
+                   MAX(reported_at), now()
+            FROM spam_reports
+            WHERE is_active AND phone_key IS NOT NULL
+            GROUP BY phone_key;
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="spamscore",
+            name="phone_number",
+            field=models.CharField(max_length=17),
+        ),
+        migrations.AlterField(
+            model_name="spamscore",
+            name="phone_key",
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("spam", "0006_spamscore_phone_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SpamLikelihoodBucket",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=16, primary_key=True, serialize=False),
+                ),
+                ("numbers", models.PositiveIntegerField()),
+                ("refreshed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "spam_likelihood_buckets",
+            },
+        ),
+        migrations.CreateModel(
+            name="SpamReportHourly",
+            fields=[
+                (
+                    "hour_bucket",
+                    models.DateTimeField(primary_key=True, serialize=False),
+                ),
+                ("reports", models.PositiveIntegerField(default=0)),
+                ("retractions", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "spam_report_hourly",
+            },
+        ),
+        migrations.CreateModel(
+            name="SpamTopNumber",
+            fields=[
+                (
+                    "rank",
+                    models.PositiveSmallIntegerField(primary_key=True, serialize=False),
+                ),
+                ("phone_number", models.CharField(max_length=17)),
+                ("report_count", models.PositiveIntegerField()),
+                ("refreshed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "spam_top_numbers",
+                "ordering": ["rank"],
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO spam_report_hourly (hour_bucket, reports, retractions)
+            SELECT date_trunc('hour', reported_at), COUNT(*), COUNT(*) FILTER (WHERE NOT is_active)
+            FROM spam_reports
+            GROUP BY 1
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
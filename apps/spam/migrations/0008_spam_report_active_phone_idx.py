@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The index is built concurrently
+    atomic = False
+
+    dependencies = [
+        ("spam", "0007_statistics_rollups"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="spamreport",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["phone_key"],
+                name="spam_report_active_phone_idx",
+            ),
+        ),
+    ]
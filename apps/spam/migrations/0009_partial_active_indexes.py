@@ -0,0 +1,101 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:30
+
+import django.core.validators
+from django.conf import settings
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models
+
+
+def drop_index_concurrently(name, create_sql):
+    return migrations.RunSQL(
+        f"DROP INDEX CONCURRENTLY IF EXISTS {name}",
+        create_sql,
+    )
+
+
+class Migration(migrations.Migration):
+    # The partial indexes are built before the full ones are dropped, and
+    # every index changes concurrently
+    atomic = False
+
+    dependencies = [
+        ("spam", "0008_spam_report_active_phone_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="spamreport",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["phone_key", "reported_at"],
+                name="spam_report_active_recent_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="spamreport",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["reporter", "phone_key"],
+                name="spam_report_active_rptr_idx",
+            ),
+        ),
+        RemoveIndexConcurrently(
+            model_name="spamreport",
+            name="spam_report_phone_n_093a94_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="spamreport",
+            name="spam_report_reporte_73c4e1_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="spamreport",
+            name="spam_report_reporte_3740b9_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="spamreport",
+            name="spam_report_phone_k_86f949_idx",
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="spamreport",
+                    name="is_active",
+                    field=models.BooleanField(default=True),
+                ),
+                migrations.AlterField(
+                    model_name="spamreport",
+                    name="phone_number",
+                    field=models.CharField(
+                        max_length=17,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.",
+                                regex="^\\+?1?\\d{9,15}$",
+                            )
+                        ],
+                    ),
+                ),
+            ],
+            database_operations=[
+                drop_index_concurrently(
+                    "spam_reports_is_active_fa00b5ee",
+                    "CREATE INDEX CONCURRENTLY spam_reports_is_active_fa00b5ee "
+                    "ON spam_reports (is_active)",
+                ),
+                drop_index_concurrently(
+                    "spam_reports_phone_number_05847318",
+                    "CREATE INDEX CONCURRENTLY spam_reports_phone_number_05847318 "
+                    "ON spam_reports (phone_number)",
+                ),
+                drop_index_concurrently(
+                    "spam_reports_phone_number_05847318_like",
+                    "CREATE INDEX CONCURRENTLY spam_reports_phone_number_05847318_like "
+                    "ON spam_reports (phone_number varchar_pattern_ops)",
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("spam", "0009_partial_active_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="spamscore",
+            name="decayed_reports",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="spamscore",
+            name="score_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Every active report starts out at full weight as of the last one,
+        # recompute_spam_scores replaces this with the exact decayed sums
+        migrations.RunSQL(
+            """
+            UPDATE spam_scores
+            SET decayed_reports = active_reports,
+                score_updated_at = COALESCE(last_reported_at, now())
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+# A reporter's active reports of one number in different formats keep
+# the earliest, the others are retracted
+DEACTIVATE_SQL = """
+UPDATE spam_reports r
+SET is_active = FALSE
+FROM spam_reports kept
+WHERE kept.is_active AND r.is_active
+  AND kept.reporter_id = r.reporter_id
+  AND kept.phone_key = r.phone_key
+  AND (kept.reported_at, kept.id) < (r.reported_at, r.id)
+RETURNING r.phone_key
+"""
+
+# Scores of the numbers that lost reports are recounted from what is left
+RESCORE_SQL = """
+UPDATE spam_scores s
+SET active_reports = agg.active_reports,
+    recent_reports = agg.recent_reports,
+    last_reported_at = agg.last_reported_at,
+    decayed_reports = agg.decayed_reports,
+    score_updated_at = now(),
+    updated_at = now()
+FROM (
+    SELECT phone_key,
+           COUNT(*) AS active_reports,
+           COUNT(*) FILTER (WHERE reported_at >= now() - interval '30 days') AS recent_reports,
+           MAX(reported_at) AS last_reported_at,
+           SUM(power(
+               0.5, GREATEST(EXTRACT(EPOCH FROM now() - reported_at), 0)::float8 / %(half_life)s
+           )) AS decayed_reports
+    FROM spam_reports
+    WHERE is_active AND phone_key = ANY(%(phone_keys)s)
+    GROUP BY phone_key
+) agg
+WHERE s.phone_key = agg.phone_key
+"""
+
+
+def dedup_active_reports(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DEACTIVATE_SQL)
+        phone_keys = sorted({phone_key for phone_key, in cursor.fetchall()})
+        if phone_keys:
+            cursor.execute(RESCORE_SQL, {
+                "half_life": settings.SPAM_SCORE_HALF_LIFE_DAYS * 86400,
+                "phone_keys": phone_keys,
+            })
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("spam", "0011_spamreportoutbox"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedup_active_reports, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="spamreport",
+            name="unique_active_report",
+        ),
+        migrations.AddConstraint(
+            model_name="spamreport",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_active", True)),
+                fields=("reporter", "phone_key"),
+                name="unique_active_report",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="spamreport",
+            name="spam_report_active_rptr_idx",
+        ),
+    ]
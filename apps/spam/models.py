@@ -1,8 +1,25 @@
-from django.db import models
+from django.db import connection, models, transaction
 import uuid
+from datetime import timedelta
+from asgiref.sync import sync_to_async
 from django.core.validators import RegexValidator
 from django.apps import apps
-from django.core.cache import cache
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.core.cache import TaggedCache
+from apps.core.invalidation import phone_tag, publish
+from apps.core.phone import to_e164, to_phone_key
+from . import scoring
+from .bloom import reported_numbers
+
+spam_cache = TaggedCache('spam')
+
+def likelihood_cache_key(phone_number):
+    return f'spam_likelihood_{phone_number}'
+
 
 class SpamReport(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -13,23 +30,34 @@ class SpamReport(models.Model):
     )
     phone_number = models.CharField(
         validators=[phone_regex],
-        max_length=17,
-        db_index=True
+        max_length=17
     )
+    e164 = models.CharField(max_length=17, null=True, editable=False)  # Canonical form used for lookups
+    phone_key = models.BigIntegerField(null=True, editable=False)  # e164 digits, the indexed lookup key
     reported_at = models.DateTimeField(auto_now_add=True, db_index=True)
-    is_active = models.BooleanField(default=True, db_index=True)
+    is_active = models.BooleanField(default=True)
     
     class Meta:
         db_table = 'spam_reports'
+        # Lookups only ever read active reports, so retracted rows are left
+        # out of the indexes
         indexes = [
-            models.Index(fields=['phone_number', 'is_active']),
-            models.Index(fields=['reporter', 'phone_number', 'is_active']),
-            models.Index(fields=['reported_at', 'is_active']),
+            models.Index(
+                fields=['phone_key'],
+                condition=models.Q(is_active=True),
+                name='spam_report_active_phone_idx'
+            ),
+            models.Index(
+                fields=['phone_key', 'reported_at'],
+                condition=models.Q(is_active=True),
+                name='spam_report_active_recent_idx'
+            ),
         ]
         ordering = ['-reported_at']
         constraints = [
+            # Also serves the reporter's own lookups, so no separate index
             models.UniqueConstraint(
-                fields=['reporter', 'phone_number'],
+                fields=['reporter', 'phone_key'],
                 condition=models.Q(is_active=True),
                 name='unique_active_report'
             )
@@ -37,28 +65,341 @@ class SpamReport(models.Model):
 
     def __str__(self):
         return f"Spam report for {self.phone_number}"
+
+    def save(self, *args, **kwargs):
+        self.e164 = to_e164(self.phone_number)
+        self.phone_key = to_phone_key(self.e164)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'e164', 'phone_key'}
+        super().save(*args, **kwargs)
     
     @classmethod
     def get_spam_likelihood(cls, phone_number):
         """
-        Calculate spam likelihood for a phone number
+        Calculate spam likelihood for an E.164 phone number
         Returns percentage based on number of active reports
         """
-        cache_key = f'spam_likelihood_{phone_number}'
-        cache.delete(cache_key)
-        likelihood = cache.get(cache_key)
-        
-        if likelihood is None:
-            total_reports = cls.objects.filter(
-                phone_number=phone_number,
-                is_active=True
-            ).count()
-
-            if total_reports == 0:
-                likelihood = 0.0
+        return cls.get_spam_likelihoods([phone_number])[phone_number]
+
+    @classmethod
+    def get_spam_likelihoods(cls, phone_numbers):
+        """
+        Bulk variant of get_spam_likelihood for result sets
+        Returns a dict of phone number to likelihood using one cache
+        multi-get plus one query for the numbers that missed the cache.
+        Entries are tagged with their number and purged when it is reported.
+        Numbers the reported numbers filter has never seen skip both.
+        """
+        likelihoods, phone_numbers = cls._filter_unreported(phone_numbers)
+        if not phone_numbers:
+            return likelihoods
+
+        cache_keys, tags = cls._likelihood_cache_keys(phone_numbers)
+        hits, versions = spam_cache.get_many(
+            cache_keys, [tag for key_tags in tags.values() for tag in key_tags]
+        )
+        likelihoods.update((cache_keys[key], value) for key, value in hits.items())
+
+        missing = phone_numbers - likelihoods.keys()
+        if missing:
+            phone_keys, scores = cls._scores_of(missing)
+            fresh = cls._fresh_likelihoods(missing, phone_keys, scores)
+            spam_cache.set_many(
+                {likelihood_cache_key(n): value for n, value in fresh.items()},
+                tags,
+                versions,
+                timeout=settings.SPAM_CACHE_TIMEOUT
+            )
+            likelihoods.update(fresh)
+
+        return likelihoods
+
+    @classmethod
+    async def aget_spam_likelihoods(cls, phone_numbers):
+        """get_spam_likelihoods for async views"""
+        # A due filter sync reads the shared cache, keep it off the event loop
+        await sync_to_async(reported_numbers.refresh)()
+        likelihoods, phone_numbers = cls._filter_unreported(phone_numbers, sync=False)
+        if not phone_numbers:
+            return likelihoods
+
+        cache_keys, tags = cls._likelihood_cache_keys(phone_numbers)
+        hits, versions = await spam_cache.aget_many(
+            cache_keys, [tag for key_tags in tags.values() for tag in key_tags]
+        )
+        likelihoods.update((cache_keys[key], value) for key, value in hits.items())
+
+        missing = phone_numbers - likelihoods.keys()
+        if missing:
+            phone_keys, scores = cls._scores_of(missing)
+            fresh = cls._fresh_likelihoods(missing, phone_keys, [row async for row in scores])
+            await spam_cache.aset_many(
+                {likelihood_cache_key(n): value for n, value in fresh.items()},
+                tags,
+                versions,
+                timeout=settings.SPAM_CACHE_TIMEOUT
+            )
+            likelihoods.update(fresh)
+
+        return likelihoods
+
+    @staticmethod
+    def _filter_unreported(phone_numbers, sync=True):
+        """Likelihood 0 for the numbers that were never reported, and the rest"""
+        likelihoods = {}
+        candidates = set()
+        for number in set(phone_numbers):
+            if reported_numbers.might_be_reported(to_phone_key(number), sync=sync):
+                candidates.add(number)
             else:
-                likelihood = min((total_reports / 5) * 100, 100)
-            
-            cache.set(cache_key, likelihood, timeout=3600)  # 1 hour
+                likelihoods[number] = 0.0
+        return likelihoods, candidates
+
+    @staticmethod
+    def _likelihood_cache_keys(phone_numbers):
+        cache_keys = {likelihood_cache_key(n): n for n in phone_numbers}
+        tags = {likelihood_cache_key(n): [phone_tag(n)] for n in phone_numbers}
+        return cache_keys, tags
+
+    @staticmethod
+    def _scores_of(phone_numbers):
+        """Phone key of each number and the unevaluated query for their scores"""
+        phone_keys = {number: to_phone_key(number) for number in phone_numbers}
+        scores = SpamScore.objects.filter(
+            phone_key__in=[key for key in phone_keys.values() if key is not None]
+        ).values_list('phone_key', 'decayed_reports', 'score_updated_at')
+        return phone_keys, scores
+
+    @staticmethod
+    def _fresh_likelihoods(phone_numbers, phone_keys, scores):
+        now = timezone.now()
+        weights = {
+            phone_key: scoring.decayed_weight(weight, updated_at, now)
+            for phone_key, weight, updated_at in scores
+        }
+        return {
+            number: scoring.likelihood(weights.get(phone_keys[number], 0.0))
+            for number in phone_numbers
+        }
+
+
+class SpamScore(models.Model):
+    """
+    Per-number aggregate of active spam reports, keyed by phone key.
+    Kept in step with SpamReport writes so that reading a score is a
+    single primary-key lookup instead of a COUNT over spam_reports.
+    Reports only age out of recent_reports when rebuild_spam_scores runs.
+    decayed_reports is the time-decayed report weight as of
+    score_updated_at, see apps.spam.scoring.
+    """
+    RECENT_WINDOW = timedelta(days=30)
+
+    phone_key = models.BigIntegerField(primary_key=True)
+    phone_number = models.CharField(max_length=17)  # E.164 form of phone_key
+    active_reports = models.PositiveIntegerField(default=0)
+    recent_reports = models.PositiveIntegerField(default=0)
+    last_reported_at = models.DateTimeField(null=True, blank=True)
+    decayed_reports = models.FloatField(default=0)
+    score_updated_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'spam_scores'
+
+    def __str__(self):
+        return f"Spam score for {self.phone_number}"
+
+    @classmethod
+    def record_report(cls, phone_number, reported_at):
+        """Count a newly created report. Must run inside the report's transaction."""
+        SpamReportHourly.record_after_commit(reported_at, reports=1)
+        phone_key = to_phone_key(phone_number)
+        if phone_key is None:
+            # Nothing can look the number up, so there is nothing to score
+            return
+        cls.objects.get_or_create(phone_key=phone_key, defaults={'phone_number': phone_number})
+        now = timezone.now()
+        cls.objects.filter(phone_key=phone_key).update(
+            active_reports=F('active_reports') + 1,
+            recent_reports=F('recent_reports') + 1,
+            last_reported_at=reported_at,
+            decayed_reports=scoring.decayed_weight_expression(now) + 1,
+            score_updated_at=now,
+            updated_at=now
+        )
+        reported_numbers.add([phone_key])
+        publish(phone_numbers=[phone_number])
+
+    @classmethod
+    def record_reports(cls, reports):
+        """
+        Count a batch of newly created reports with one upsert
+        Must run inside the transaction that created them. Scores are
+        locked in phone key order, so concurrent batches cannot deadlock.
+        """
+        now = timezone.now()
+        recent_since = now - cls.RECENT_WINDOW
+        hours = {}
+        scores = {}
+        for report in reports:
+            hour = SpamReportHourly.bucket(report.reported_at)
+            hours[hour] = hours.get(hour, 0) + 1
+            if report.phone_key is None:
+                continue
+            score = scores.setdefault(report.phone_key, {
+                'phone_number': report.e164,
+                'active_reports': 0,
+                'recent_reports': 0,
+                'last_reported_at': report.reported_at,
+                'decayed_reports': 0.0,
+            })
+            score['active_reports'] += 1
+            score['recent_reports'] += report.reported_at >= recent_since
+            score['last_reported_at'] = max(score['last_reported_at'], report.reported_at)
+            score['decayed_reports'] += scoring.decay((now - report.reported_at).total_seconds())
+        for hour, count in hours.items():
+            SpamReportHourly.record_after_commit(hour, reports=count)
+        if not scores:
+            return
 
-        return likelihood
\ No newline at end of file
+        phone_keys = sorted(scores)
+        columns = [
+            [scores[key][field] for key in phone_keys]
+            for field in (
+                'phone_number', 'active_reports', 'recent_reports',
+                'last_reported_at', 'decayed_reports'
+            )
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO spam_scores AS s (phone_key, phone_number, active_reports, '
+                'recent_reports, last_reported_at, decayed_reports, score_updated_at, updated_at) '
+                'SELECT batch.*, %s, %s FROM unnest('
+                '%s::bigint[], %s::varchar[], %s::integer[], %s::integer[], '
+                '%s::timestamptz[], %s::float8[]) AS batch '
+                'ON CONFLICT (phone_key) DO UPDATE SET '
+                'active_reports = s.active_reports + EXCLUDED.active_reports, '
+                'recent_reports = s.recent_reports + EXCLUDED.recent_reports, '
+                'last_reported_at = GREATEST(s.last_reported_at, EXCLUDED.last_reported_at), '
+                f'decayed_reports = {scoring.decayed_weight_sql("s")} + EXCLUDED.decayed_reports, '
+                'score_updated_at = EXCLUDED.score_updated_at, '
+                'updated_at = EXCLUDED.updated_at',
+                [now, now, phone_keys, *columns, now, scoring.half_life_seconds()]
+            )
+        reported_numbers.add(phone_keys)
+        publish(phone_numbers=columns[0])
+
+    @classmethod
+    def record_retraction(cls, phone_number, reported_at):
+        """Discount a retracted report. Must run inside the retraction's transaction."""
+        SpamReportHourly.record_after_commit(reported_at, retractions=1)
+        now = timezone.now()
+        # The report only takes back what it is still worth
+        remaining = scoring.decay((now - reported_at).total_seconds())
+        updates = {
+            'active_reports': Greatest(F('active_reports') - 1, Value(0)),
+            'decayed_reports': Case(
+                # No float residue once the last report is gone
+                When(active_reports__lte=1, then=Value(0.0)),
+                default=Greatest(scoring.decayed_weight_expression(now) - remaining, Value(0.0))
+            ),
+            'score_updated_at': now,
+            'updated_at': now,
+        }
+        if reported_at >= now - cls.RECENT_WINDOW:
+            updates['recent_reports'] = Greatest(F('recent_reports') - 1, Value(0))
+        cls.objects.filter(phone_key=to_phone_key(phone_number)).update(**updates)
+        publish(phone_numbers=[phone_number])
+
+
+class SpamReportOutbox(models.Model):
+    """
+    Reports accepted while SPAM_REPORT_QUEUE_ENABLED is set, waiting for
+    drain_spam_reports to insert and count them in batches. Queueing is a
+    plain append, so report waves against one number do not contend on
+    unique_active_report. report_id becomes the id of the SpamReport.
+    """
+    report_id = models.UUIDField(default=uuid.uuid4, editable=False)
+    reporter = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='queued_spam_reports')
+    phone_number = models.CharField(max_length=17)
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'spam_report_outbox'
+
+    def __str__(self):
+        return f"Queued spam report for {self.phone_number}"
+
+
+class SpamReportHourly(models.Model):
+    """
+    Reports per hour of reported_at, and how many of them were retracted.
+    Active reports in any window of whole hours is the sum of
+    reports - retractions over its buckets, so statistics never scan
+    spam_reports. Counters are bumped after the report commits and can be
+    rebuilt with refresh_spam_statistics --rebuild-hourly.
+    """
+    hour_bucket = models.DateTimeField(primary_key=True)
+    reports = models.PositiveIntegerField(default=0)
+    retractions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'spam_report_hourly'
+
+    def __str__(self):
+        return f"Spam reports for {self.hour_bucket}"
+
+    @staticmethod
+    def bucket(reported_at):
+        return reported_at.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def record(cls, reported_at, reports=0, retractions=0):
+        """Add to the counters of the hour reported_at falls in"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO spam_report_hourly (hour_bucket, reports, retractions) '
+                'VALUES (%s, %s, %s) '
+                'ON CONFLICT (hour_bucket) DO UPDATE SET '
+                'reports = spam_report_hourly.reports + EXCLUDED.reports, '
+                'retractions = spam_report_hourly.retractions + EXCLUDED.retractions',
+                [cls.bucket(reported_at), reports, retractions]
+            )
+
+    @classmethod
+    def record_after_commit(cls, reported_at, reports=0, retractions=0):
+        """
+        Count a report or retraction once its transaction commits
+        Every report of an hour shares one row, so the row is only locked
+        for this single statement instead of for the whole report.
+        """
+        transaction.on_commit(lambda: cls.record(reported_at, reports, retractions))
+
+
+class SpamTopNumber(models.Model):
+    """Most reported numbers, replaced by refresh_spam_statistics"""
+    rank = models.PositiveSmallIntegerField(primary_key=True)
+    phone_number = models.CharField(max_length=17)
+    report_count = models.PositiveIntegerField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'spam_top_numbers'
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.phone_number}"
+
+
+class SpamLikelihoodBucket(models.Model):
+    """How many numbers fall in each likelihood bucket, replaced by refresh_spam_statistics"""
+    name = models.CharField(max_length=16, primary_key=True)
+    numbers = models.PositiveIntegerField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'spam_likelihood_buckets'
+
+    def __str__(self):
+        return f"{self.name}: {self.numbers}"
@@ -0,0 +1,83 @@
+"""
+Raw SQL for the spam status and statistics endpoints.
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import SpamScore
+from .scoring import decayed_weight, decayed_weight_sql, half_life_seconds, likelihood
+
+# Numbers are bucketed on the decayed report weight that get_spam_likelihood
+# scores, brought forward to now, in one pass over spam_scores.
+LIKELIHOOD_DISTRIBUTION_SQL = """
+WITH per_number AS (
+    SELECT {weight} AS weight
+    FROM spam_scores s
+    WHERE s.active_reports > 0
+)
+SELECT COUNT(*) FILTER (WHERE weight >= %s) AS high,
+       COUNT(*) FILTER (WHERE weight >= %s AND weight < %s) AS medium,
+       COUNT(*) FILTER (WHERE weight < %s) AS low
+FROM per_number
+"""
+
+
+def likelihood_distribution():
+    """
+    Numbers with active reports per likelihood bucket, in one pass
+    The bounds are decayed weights on the SPAM_LIKELIHOOD_FULL_REPORTS
+    scale: medium starts where the default likelihood reaches 100% and
+    high at SPAM_DISTRIBUTION_HIGH_REPORTS fresh reports.
+    """
+    high = settings.SPAM_DISTRIBUTION_HIGH_REPORTS
+    medium = settings.SPAM_DISTRIBUTION_MEDIUM_REPORTS
+    with connection.cursor() as cursor:
+        cursor.execute(
+            LIKELIHOOD_DISTRIBUTION_SQL.format(weight=decayed_weight_sql('s')),
+            (timezone.now(), half_life_seconds(), high, medium, high, medium)
+        )
+        high, medium, low = cursor.fetchone()
+    return {'high': high, 'medium': medium, 'low': low}
+
+
+# Everything /api/spam/status/ reports about a number, in one round trip.
+# The report counts are conditional aggregates over the partial index of
+# active reports, the score row and the requester's contact are single probes.
+SPAM_STATUS_SQL = """
+SELECT reports.total, reports.recent, reports.reported_by_user,
+       s.decayed_reports, s.score_updated_at,
+       EXISTS (
+           SELECT 1 FROM contacts c
+           WHERE c.phone_key = %(phone_key)s AND c.user_id = %(user_id)s
+       ) AS is_user_contact
+FROM (
+    SELECT COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE reported_at >= %(recent_since)s) AS recent,
+           COUNT(*) FILTER (WHERE reporter_id = %(user_id)s) > 0 AS reported_by_user
+    FROM spam_reports
+    WHERE phone_key = %(phone_key)s AND is_active
+) reports
+LEFT JOIN spam_scores s ON s.phone_key = %(phone_key)s
+"""
+
+
+def spam_status(phone_number, phone_key, user):
+    """Spam likelihood, report counts and the requester's relation to a number"""
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(SPAM_STATUS_SQL, {
+            'phone_key': phone_key,
+            'user_id': user.pk,
+            'recent_since': now - SpamScore.RECENT_WINDOW,
+        })
+        (total, recent, reported_by_user, decayed_reports, score_updated_at,
+         is_user_contact) = cursor.fetchone()
+    return {
+        'phone_number': phone_number,
+        'spam_likelihood': likelihood(decayed_weight(decayed_reports, score_updated_at, now)),
+        'total_reports': total,
+        'reported_by_user': reported_by_user,
+        'recent_reports_count': recent,
+        'is_user_contact': is_user_contact,
+    }
@@ -0,0 +1,74 @@
+"""
+Time-decayed spam scores.
+Each number keeps one exponentially decayed report weight and the time it
+was last brought up to date. A report adds 1 and a retraction removes
+what its report is still worth, after decaying the stored weight to now,
+so both are O(1) and reading a score needs no scan over spam_reports.
+The weight is turned into a likelihood by SPAM_SCORE_FUNCTION.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+# Decimal places of the likelihoods served, so the decay of a fresh report
+# reads as 20.0 rather than 19.99999996 and cached values stay stable
+LIKELIHOOD_DECIMALS = 2
+
+
+def half_life_seconds():
+    return settings.SPAM_SCORE_HALF_LIFE_DAYS * 86400
+
+
+def decay(elapsed_seconds):
+    """Share of a report's weight left after elapsed_seconds"""
+    return 0.5 ** (max(elapsed_seconds, 0) / half_life_seconds())
+
+
+def decayed_weight(weight, updated_at, now):
+    """Stored weight brought forward from updated_at to now"""
+    if not weight or updated_at is None:
+        return 0.0
+    return weight * decay((now - updated_at).total_seconds())
+
+
+# decayed_weight over a spam_scores row, in SQL
+DECAYED_WEIGHT_SQL = """
+COALESCE({table}.decayed_reports * power(
+    0.5, GREATEST(EXTRACT(EPOCH FROM %s - {table}.score_updated_at), 0)::float8 / %s
+), 0)
+"""
+
+
+def decayed_weight_sql(table='spam_scores'):
+    """DECAYED_WEIGHT_SQL over table, taking now and half_life_seconds() as parameters"""
+    return DECAYED_WEIGHT_SQL.format(table=table)
+
+
+def decayed_weight_expression(now):
+    """The row's decayed weight as of now, for use in updates"""
+    return RawSQL(decayed_weight_sql(), (now, half_life_seconds()), output_field=FloatField())
+
+
+def linear_likelihood(weight):
+    """
+    Default scoring function
+    Grows linearly with the decayed weight and reaches 100% at
+    SPAM_LIKELIHOOD_FULL_REPORTS fresh reports.
+    """
+    if weight <= 0:
+        return 0.0
+    return min((weight / settings.SPAM_LIKELIHOOD_FULL_REPORTS) * 100, 100)
+
+
+@lru_cache(maxsize=None)
+def _load(path):
+    return import_string(path)
+
+
+def likelihood(weight):
+    """Spam percentage of a decayed report weight, as SPAM_SCORE_FUNCTION scores it"""
+    return round(_load(settings.SPAM_SCORE_FUNCTION)(weight), LIKELIHOOD_DECIMALS)
@@ -1,8 +1,8 @@
 from rest_framework import serializers
-from .models import SpamReport
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count
+from django.conf import settings
+from apps.core.phone import to_e164, to_phone_key
+from .models import SpamReport, SpamReportHourly
+from django.db.models import Sum
 from django.db.models.functions import ExtractWeekDay, ExtractHour
 
 class SpamReportSerializer(serializers.ModelSerializer):
@@ -13,8 +13,13 @@ class SpamReportSerializer(serializers.ModelSerializer):
         
     def validate_phone_number(self, value):
         """Validate phone number isn't user's own number"""
+        e164 = to_e164(value)
+        if to_phone_key(e164) is None:
+            raise serializers.ValidationError(
+                "Enter the phone number with its country code."
+            )
         request = self.context.get('request')
-        if request and request.user and request.user.phone_number == value:
+        if request and request.user and request.user.e164 == e164:
             raise serializers.ValidationError(
                 "You cannot mark your own number as spam."
             )
@@ -26,7 +31,7 @@ class SpamReportSerializer(serializers.ModelSerializer):
         if request and request.user:
             existing_report = SpamReport.objects.filter(
                 reporter=request.user,
-                phone_number=data['phone_number'],
+                phone_key=to_phone_key(to_e164(data['phone_number'])),
                 is_active=True
             ).exists()
             if existing_report:
@@ -35,39 +40,25 @@ class SpamReportSerializer(serializers.ModelSerializer):
                 )
         return data
 
+class SpamBulkReportSerializer(serializers.Serializer):
+    """
+    Validates a bulk spam report
+    Individual numbers are checked by the view, which skips the ones it
+    cannot report instead of failing the whole request.
+    """
+    phone_numbers = serializers.ListField(
+        child=serializers.CharField(max_length=32),
+        allow_empty=False,
+        max_length=settings.SPAM_BULK_REPORT_MAX_NUMBERS
+    )
+
 class SpamStatusSerializer(serializers.Serializer):
     phone_number = serializers.CharField()
     spam_likelihood = serializers.FloatField()
     total_reports = serializers.IntegerField()
-    reported_by_user = serializers.SerializerMethodField()
-    recent_reports_count = serializers.SerializerMethodField()
-    is_user_contact = serializers.SerializerMethodField()
-    
-    def get_reported_by_user(self, obj):
-        request = self.context.get('request')
-        if request and request.user:
-            return SpamReport.objects.filter(
-                reporter=request.user,
-                phone_number=obj['phone_number'],
-                is_active=True
-            ).exists()
-        return False
-    
-    def get_recent_reports_count(self, obj):
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        return SpamReport.objects.filter(
-            phone_number=obj['phone_number'],
-            is_active=True,
-            reported_at__gte=thirty_days_ago
-        ).count()
-        
-    def get_is_user_contact(self, obj):
-        request = self.context.get('request')
-        if request and request.user:
-            return request.user.contacts.filter(
-                phone_number=obj['phone_number']
-            ).exists()
-        return False
+    reported_by_user = serializers.BooleanField()
+    recent_reports_count = serializers.IntegerField()
+    is_user_contact = serializers.BooleanField()
 
 class SpamStatisticsSerializer(serializers.Serializer):
     total_reports = serializers.IntegerField()
@@ -92,15 +83,15 @@ class SpamStatisticsSerializer(serializers.Serializer):
         return data
     
     def _get_reports_by_day_of_week(self):
-        return SpamReport.objects.annotate(
-            day=ExtractWeekDay('reported_at')
+        return SpamReportHourly.objects.annotate(
+            day=ExtractWeekDay('hour_bucket')
         ).values('day').annotate(
-            count=Count('id')
+            count=Sum('reports')
         ).order_by('day')
     
     def _get_peak_reporting_hours(self):
-        return SpamReport.objects.annotate(
-            hour=ExtractHour('reported_at')
+        return SpamReportHourly.objects.annotate(
+            hour=ExtractHour('hour_bucket')
         ).values('hour').annotate(
-            count=Count('id')
+            count=Sum('reports')
         ).order_by('-count')[:5]
\ No newline at end of file
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.core.invalidation import cache_invalidated, phone_tag
+from .models import SpamReport, SpamScore, spam_cache
+
+
+@receiver(cache_invalidated)
+def purge_spam_likelihoods(sender, phone_numbers, **kwargs):
+    """Purge cached likelihoods of numbers whose reports changed"""
+    if phone_numbers:
+        spam_cache.invalidate(phone_tag(n) for n in phone_numbers)
+
+
+@receiver(post_delete, sender=SpamReport)
+def discount_deleted_report(sender, instance, **kwargs):
+    """Take deleted active reports, e.g. of a deleted reporter, out of their number's score"""
+    if instance.is_active and instance.phone_key is not None:
+        SpamScore.record_retraction(instance.e164, instance.reported_at)
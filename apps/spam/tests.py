@@ -1,3 +1,74 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.contacts.models import Contact
+from apps.core.phone import to_phone_key
+from apps.users.models import User
+from .bloom import build_snapshot, reported_numbers
+from .models import SpamReport, SpamScore
+
+
+class SpamStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone_number='+919000000001', name='Asha')
+        cls.other = User.objects.create_user(phone_number='+919000000002', name='Ravi')
+        cls.number = '+917000000001'
+        Contact.objects.create(user=cls.user, name='Courier', phone_number=cls.number)
+        for reporter in (cls.user, cls.other):
+            report = SpamReport.objects.create(reporter=reporter, phone_number=cls.number)
+            SpamScore.record_report(report.e164, report.reported_at)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_status_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/spam/status/{self.number}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_reports'], 2)
+        self.assertEqual(response.data['recent_reports_count'], 2)
+        self.assertTrue(response.data['reported_by_user'])
+        self.assertTrue(response.data['is_user_contact'])
+        self.assertEqual(response.data['spam_likelihood'], 40.0)
+
+    def test_status_of_unreported_number(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/spam/status/+917000000002/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_reports'], 0)
+        self.assertFalse(response.data['reported_by_user'])
+        self.assertFalse(response.data['is_user_contact'])
+        self.assertEqual(response.data['spam_likelihood'], 0.0)
+
+
+@override_settings(SPAM_FILTER_ENABLED=True)
+class ReportedNumbersFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone_number='+919000000003', name='Meera')
+        cls.number = '+917000000003'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        build_snapshot()
+        reported_numbers.refresh(force=True)
+
+    def test_fresh_report_is_not_a_definite_negative(self):
+        self.assertFalse(reported_numbers.might_be_reported(to_phone_key(self.number)))
+
+        response = self.client.post('/api/spam/report/', {'phone_number': self.number})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(response.data['current_spam_likelihood'], 0.0)
+        self.assertGreater(SpamReport.get_spam_likelihood(self.number), 0.0)
+
+        # The report has not committed, so a reloaded snapshot does not have it
+        reported_numbers.bloom = None
+        reported_numbers.refresh(force=True)
+        self.assertIsNotNone(reported_numbers.bloom)
+        self.assertGreater(SpamReport.get_spam_likelihood(self.number), 0.0)
@@ -1,8 +1,14 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 from rest_framework.routers import DefaultRouter
-from .views import SpamViewSet
+from .views import SpamViewSet, spam_status_async
 
 router = DefaultRouter()
 router.register('spam', SpamViewSet, basename='spam')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls
+
+if settings.ASYNC_LOOKUP_VIEWS:
+    urlpatterns = [re_path(
+        r'^spam/status/(?P<phone_number>[^/.]+)/$', spam_status_async, name='spam-spam-status'
+    )] + urlpatterns
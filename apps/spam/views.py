@@ -1,12 +1,28 @@
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
 
-from .models import SpamReport
+from apps.core.async_views import async_api_view
+from apps.core.phone import to_e164, to_phone_key
+from .models import (
+    SpamLikelihoodBucket,
+    SpamReport,
+    SpamReportHourly,
+    SpamReportOutbox,
+    SpamScore,
+    SpamTopNumber,
+)
+from .queries import spam_status
 from .serializers import (
+    SpamBulkReportSerializer,
     SpamReportSerializer,
     SpamStatusSerializer,
     SpamStatisticsSerializer
@@ -21,14 +37,21 @@ class SpamViewSet(viewsets.GenericViewSet):
         """Report a number as spam"""
         serializer = self.get_serializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            spam_report = SpamReport.objects.create(
-                reporter=request.user,
-                phone_number=serializer.validated_data['phone_number'],
-                is_active=True
-            )
+            if settings.SPAM_REPORT_QUEUE_ENABLED:
+                return self._queue_report(request, serializer.validated_data['phone_number'])
+            with transaction.atomic():
+                spam_report = SpamReport.objects.create(
+                    reporter=request.user,
+                    phone_number=serializer.validated_data['phone_number'],
+                    is_active=True
+                )
+                SpamScore.record_report(
+                    spam_report.e164,
+                    spam_report.reported_at
+                )
             
             spam_likelihood = SpamReport.get_spam_likelihood(
-                spam_report.phone_number
+                spam_report.e164
             )
             
             return Response({
@@ -40,19 +63,117 @@ class SpamViewSet(viewsets.GenericViewSet):
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='report/bulk')
+    def report_spam_bulk(self, request):
+        """
+        Report many numbers as spam in one request
+        Numbers that cannot be reported are skipped with the reason, the
+        rest are inserted together and counted with one score upsert.
+        """
+        serializer = SpamBulkReportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        skipped = {}
+        candidates = {}
+        for phone_number in serializer.validated_data['phone_numbers']:
+            e164 = to_e164(phone_number) or phone_number
+            phone_key = to_phone_key(e164)
+            try:
+                SpamReport.phone_regex(phone_number)
+            except ValidationError:
+                phone_key = None
+            if phone_key is None:
+                skipped[e164] = 'invalid'
+            elif phone_key == request.user.phone_key:
+                skipped[e164] = 'own_number'
+            else:
+                candidates.setdefault(e164, (phone_number, phone_key))
+
+        already_reported = set(SpamReport.objects.filter(
+            reporter=request.user,
+            phone_key__in=[phone_key for _, phone_key in candidates.values()],
+            is_active=True
+        ).values_list('phone_key', flat=True))
+        to_report = {}
+        for e164, (phone_number, phone_key) in candidates.items():
+            if phone_key in already_reported:
+                skipped[e164] = 'already_reported'
+            else:
+                to_report[e164] = phone_number
+
+        if to_report and settings.SPAM_REPORT_QUEUE_ENABLED:
+            SpamReportOutbox.objects.bulk_create([
+                SpamReportOutbox(reporter=request.user, phone_number=phone_number)
+                for phone_number in to_report.values()
+            ])
+        elif to_report:
+            reports = [
+                SpamReport(
+                    reporter=request.user,
+                    phone_number=phone_number,
+                    e164=e164,
+                    phone_key=candidates[e164][1],
+                    is_active=True
+                )
+                for e164, phone_number in to_report.items()
+            ]
+            with transaction.atomic():
+                # A concurrent single report of the same number wins
+                SpamReport.objects.bulk_create(reports, ignore_conflicts=True)
+                created = list(SpamReport.objects.filter(id__in=[report.id for report in reports]))
+                SpamScore.record_reports(created)
+            created_numbers = {report.e164 for report in created}
+            for e164 in list(to_report):
+                if e164 not in created_numbers:
+                    del to_report[e164]
+                    skipped[e164] = 'already_reported'
+
+        if not to_report:
+            response_status = status.HTTP_200_OK
+        elif settings.SPAM_REPORT_QUEUE_ENABLED:
+            response_status = status.HTTP_202_ACCEPTED
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({
+            'status': 'queued' if settings.SPAM_REPORT_QUEUE_ENABLED else 'success',
+            'reported': list(to_report),
+            'skipped': skipped,
+            'spam_likelihoods': SpamReport.get_spam_likelihoods(list(to_report) + list(skipped)),
+        }, status=response_status)
+
+    def _queue_report(self, request, phone_number):
+        """Accept a report for drain_spam_reports to insert later"""
+        queued = SpamReportOutbox.objects.create(
+            reporter=request.user,
+            phone_number=phone_number
+        )
+        return Response({
+            'status': 'queued',
+            'message': 'Spam report accepted',
+            'current_spam_likelihood': SpamReport.get_spam_likelihood(to_e164(phone_number)),
+            'report_id': str(queued.report_id)
+        }, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['delete'], url_path='retract')
     def retract_report(self, request, pk=None):
         """Retract a spam report"""
         try:
-            report = SpamReport.objects.get(
-                reporter=request.user,
-                phone_number=pk,
-                is_active=True
-            )
-            report.is_active = False
-            report.save()
+            phone_number = to_e164(pk)
+            phone_key = to_phone_key(phone_number)
+            if phone_key is None:
+                raise SpamReport.DoesNotExist
+            with transaction.atomic():
+                report = SpamReport.objects.select_for_update().get(
+                    reporter=request.user,
+                    phone_key=phone_key,
+                    is_active=True
+                )
+                report.is_active = False
+                report.save()
+                SpamScore.record_retraction(phone_number, report.reported_at)
             
-            spam_likelihood = SpamReport.get_spam_likelihood(pk)
+            spam_likelihood = SpamReport.get_spam_likelihood(phone_number)
             
             return Response({
                 'status': 'success',
@@ -69,26 +190,15 @@ class SpamViewSet(viewsets.GenericViewSet):
     def spam_status(self, request, phone_number=None):
         """Get spam status for a phone number"""
         try:
-            spam_likelihood = SpamReport.get_spam_likelihood(phone_number)
-            total_reports = SpamReport.objects.filter(
-                phone_number=phone_number,
-                is_active=True
-            ).count()
-            
-            thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-            recent_reports = SpamReport.objects.filter(
-                phone_number=phone_number,
-                is_active=True,
-                reported_at__gte=thirty_days_ago
-            ).count()
-            
-            data = {
-                'phone_number': phone_number,
-                'spam_likelihood': spam_likelihood,
-                'total_reports': total_reports,
-                'recent_reports_count': recent_reports
-            }
-            
+            phone_number = to_e164(phone_number)
+            phone_key = to_phone_key(phone_number)
+            if phone_key is None:
+                return Response(
+                    {'error': 'Invalid phone number'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            data = spam_status(phone_number, phone_key, request.user)
+
             serializer = SpamStatusSerializer(
                 data=data,
                 context={'request': request}
@@ -109,46 +219,26 @@ class SpamViewSet(viewsets.GenericViewSet):
     def get_statistics(self, request):
         """Get overall spam reporting statistics"""
         try:
-            today = timezone.now().date()
+            today = SpamReportHourly.bucket(timezone.now()).replace(hour=0)
             week_ago = today - timezone.timedelta(days=7)
             month_ago = today - timezone.timedelta(days=30)
 
-            stats = {
-                'total_reports': SpamReport.objects.filter(is_active=True).count(),
-                'reports_today': SpamReport.objects.filter(
-                    is_active=True,
-                    reported_at__date=today
-                ).count(),
-                'reports_this_week': SpamReport.objects.filter(
-                    is_active=True,
-                    reported_at__date__gte=week_ago
-                ).count(),
-                'reports_this_month': SpamReport.objects.filter(
-                    is_active=True,
-                    reported_at__date__gte=month_ago
-                ).count(),
-                'most_reported_numbers': SpamReport.objects.filter(
-                    is_active=True
-                ).values('phone_number').annotate(
-                    report_count=Count('id')
-                ).order_by('-report_count')[:10],
-                'spam_likelihood_distribution': {
-                    'high': SpamReport.objects.filter(
-                        is_active=True
-                    ).values('phone_number').annotate(
-                        count=Count('id')
-                    ).filter(count__gte=10).count(),
-                    'medium': SpamReport.objects.filter(
-                        is_active=True
-                    ).values('phone_number').annotate(
-                        count=Count('id')
-                    ).filter(count__range=(5, 9)).count(),
-                    'low': SpamReport.objects.filter(
-                        is_active=True
-                    ).values('phone_number').annotate(
-                        count=Count('id')
-                    ).filter(count__lt=5).count()
-                }
+            # Every figure comes from the rollups, never from spam_reports
+            active = F('reports') - F('retractions')
+            stats = SpamReportHourly.objects.aggregate(
+                total_reports=Coalesce(Sum(active), 0),
+                reports_today=Coalesce(Sum(active, filter=Q(hour_bucket__gte=today)), 0),
+                reports_this_week=Coalesce(Sum(active, filter=Q(hour_bucket__gte=week_ago)), 0),
+                reports_this_month=Coalesce(Sum(active, filter=Q(hour_bucket__gte=month_ago)), 0),
+            )
+            stats['most_reported_numbers'] = list(
+                SpamTopNumber.objects.values('phone_number', 'report_count')
+            )
+            stats['spam_likelihood_distribution'] = {
+                'high': 0,
+                'medium': 0,
+                'low': 0,
+                **dict(SpamLikelihoodBucket.objects.values_list('name', 'numbers')),
             }
 
             serializer = SpamStatisticsSerializer(
@@ -165,4 +255,18 @@ class SpamViewSet(viewsets.GenericViewSet):
         except Exception as e:
             return Response({
                 'error': str(e)
-            }, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+@async_api_view
+async def spam_status_async(request, phone_number):
+    """spam_status for ASGI deployments"""
+    phone_number = to_e164(phone_number)
+    phone_key = to_phone_key(phone_number)
+    if phone_key is None:
+        return {'error': 'Invalid phone number'}, status.HTTP_400_BAD_REQUEST
+    # Already a single statement, and Django has no async cursor for it
+    data = await sync_to_async(spam_status)(phone_number, phone_key, request.user)
+    serializer = SpamStatusSerializer(data=data)
+    if serializer.is_valid():
+        return serializer.data, status.HTTP_200_OK
+    return serializer.errors, status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.core.invalidation import publish
+
+# Accounts registered after the first one with the same phone key, paired
+# with the account that keeps it
+DUPLICATE_USERS_SQL = """
+SELECT u.id, u.phone_number, u.name, kept.id, kept.phone_number, u.e164
+FROM users u
+JOIN users kept
+  ON kept.phone_key = u.phone_key
+ AND (kept.date_joined, kept.id) < (u.date_joined, u.id)
+WHERE NOT EXISTS (
+    SELECT 1 FROM users earlier
+    WHERE earlier.phone_key = u.phone_key
+      AND (earlier.date_joined, earlier.id) < (kept.date_joined, kept.id)
+)
+ORDER BY u.phone_key, u.date_joined, u.id
+"""
+
+DEACTIVATE_USERS_SQL = """
+UPDATE users SET phone_key = NULL, is_active = FALSE WHERE id = ANY(%s)
+"""
+
+# Contacts of a user that share a phone key with a more recently updated
+# one, paired with the contact that is kept
+DUPLICATE_CONTACTS_SQL = """
+SELECT c.id, c.user_id, c.phone_number, c.name, kept.phone_number, kept.name, c.e164
+FROM contacts c
+JOIN contacts kept
+  ON kept.user_id = c.user_id
+ AND kept.phone_key = c.phone_key
+ AND (kept.updated_at, kept.id) > (c.updated_at, c.id)
+WHERE NOT EXISTS (
+    SELECT 1 FROM contacts later
+    WHERE later.user_id = c.user_id
+      AND later.phone_key = c.phone_key
+      AND (later.updated_at, later.id) > (kept.updated_at, kept.id)
+)
+ORDER BY c.user_id, c.phone_key, c.updated_at, c.id
+"""
+
+DELETE_CONTACTS_SQL = """
+DELETE FROM contacts WHERE id = ANY(%s)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Resolve accounts and contacts that share a phone key, so that the '
+        'unique phone key migrations can run. Later accounts with the same '
+        'number are deactivated and lose their phone key, and duplicate '
+        'contacts of a user are deleted except the most recently updated one'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the changes without writing them'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        verb = 'Would deactivate' if dry_run else 'Deactivated'
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(DUPLICATE_USERS_SQL)
+            users = cursor.fetchall()
+            for user_id, phone_number, name, kept_id, kept_number, _ in users:
+                self.stdout.write(
+                    f'{verb} user {user_id} ({name}, {phone_number}), '
+                    f'the number belongs to user {kept_id} ({kept_number})'
+                )
+
+            cursor.execute(DUPLICATE_CONTACTS_SQL)
+            contacts = cursor.fetchall()
+            for contact_id, user_id, phone_number, name, kept_number, kept_name, _ in contacts:
+                self.stdout.write(
+                    f'{"Would delete" if dry_run else "Deleted"} contact {contact_id} '
+                    f'({name}, {phone_number}) of user {user_id}, '
+                    f'keeping {kept_name} ({kept_number})'
+                )
+
+            if not dry_run:
+                if users:
+                    cursor.execute(DEACTIVATE_USERS_SQL, [[row[0] for row in users]])
+                if contacts:
+                    cursor.execute(DELETE_CONTACTS_SQL, [[row[0] for row in contacts]])
+                publish(
+                    phone_numbers=[row[5] for row in users] + [row[6] for row in contacts],
+                    names=[row[2] for row in users] + [row[3] for row in contacts]
+                )
+
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} duplicate accounts {verb} deactivated, '
+            f'{len(contacts)} duplicate contacts {verb} deleted'
+        ))
@@ -0,0 +1,69 @@
+from django.db import migrations, transaction
+
+
+CREATE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION name_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.name_search_vector := to_tsvector('simple', coalesce(NEW.name, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+CREATE_TRIGGER_SQL = """
+CREATE TRIGGER users_name_search_vector_update
+BEFORE INSERT OR UPDATE OF name ON users
+FOR EACH ROW EXECUTE FUNCTION name_search_vector_update();
+"""
+
+# Same vectors as the trigger, written in primary key batches
+BACKFILL_SQL = """
+WITH batch AS (
+    SELECT id FROM users
+    WHERE {conditions}
+    ORDER BY id
+    LIMIT 1000
+)
+UPDATE users t
+SET name_search_vector = to_tsvector('simple', coalesce(t.name, ''))
+FROM batch
+WHERE t.id = batch.id
+RETURNING t.id
+"""
+
+
+def fill_name_search_vectors(apps, schema_editor):
+    """Recompute the vectors of existing rows, one short transaction per batch"""
+    connection = schema_editor.connection
+    last_id = None
+    while True:
+        conditions = "TRUE" if last_id is None else "id > %(last_id)s"
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(BACKFILL_SQL.format(conditions=conditions), {"last_id": last_id})
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return
+        last_id = max(ids)
+
+
+class Migration(migrations.Migration):
+    # Vectors written before the trigger were stemmed with the english
+    # config and miss word prefix matches, so they are recomputed in
+    # batches that commit one by one
+    atomic = False
+
+    dependencies = [
+        ("users", "0003_name_trigram_index"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CREATE_FUNCTION_SQL,
+            reverse_sql="DROP FUNCTION IF EXISTS name_search_vector_update();",
+        ),
+        migrations.RunSQL(
+            CREATE_TRIGGER_SQL,
+            reverse_sql="DROP TRIGGER IF EXISTS users_name_search_vector_update ON users;",
+        ),
+        migrations.RunPython(fill_name_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0004_name_search_vector_trigger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="contact_sync_version",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
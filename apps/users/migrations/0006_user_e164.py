@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:45
+
+import re
+
+import phonenumbers
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+
+NON_DIGITS_RE = re.compile(r"\D")
+
+
+def to_e164(raw, region):
+    """apps.core.phone.to_e164 as of this migration"""
+    if raw is None:
+        return None
+    raw = raw.strip()
+    digits = NON_DIGITS_RE.sub("", raw)
+    if not digits:
+        return None
+    if raw.startswith("+"):
+        raw, region = "+" + digits, None
+    elif not region:
+        return None
+    try:
+        number = phonenumbers.parse(raw, region)
+    except phonenumbers.NumberParseException:
+        return "+" + digits
+    if not phonenumbers.is_possible_number(number):
+        return "+" + digits
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def fill_e164(apps, schema_editor):
+    """Fill e164 of existing rows in primary key batches, one transaction each"""
+    model = apps.get_model("users", "User")
+    region = getattr(settings, "PHONE_DEFAULT_REGION", None)
+    last_pk = None
+    while True:
+        rows = model.objects.filter(e164__isnull=True).order_by("pk")
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        batch = list(rows.only("pk", "phone_number")[:1000])
+        if not batch:
+            return
+        for row in batch:
+            row.e164 = to_e164(row.phone_number, region)
+        with transaction.atomic():
+            model.objects.bulk_update(batch, ["e164"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Backfill batches commit one by one and the index is built concurrently
+    atomic = False
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0005_user_contact_sync_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="e164",
+            field=models.CharField(editable=False, max_length=17, null=True),
+        ),
+        migrations.RunPython(fill_e164, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(fields=["e164"], name="users_e164_838920_idx"),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:10
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("users", "0007_user_phone_key"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                django.db.models.functions.comparison.Collate(
+                    django.db.models.functions.text.Lower("name"), "C"
+                ),
+                name="users_name_lower_c_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+# The same number registered in two formats shares one phone key. Which
+# account keeps it is a decision for an operator, so the migration stops
+# and lists the conflicts instead of resolving them itself.
+DUPLICATES_SQL = """
+SELECT phone_key, COUNT(*)
+FROM users
+WHERE phone_key IS NOT NULL
+GROUP BY phone_key
+HAVING COUNT(*) > 1
+ORDER BY phone_key
+"""
+
+
+def check_duplicates(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DUPLICATES_SQL)
+        duplicates = cursor.fetchall()
+    if duplicates:
+        listed = ", ".join(f"+{phone_key} ({count} accounts)" for phone_key, count in duplicates[:20])
+        raise RuntimeError(
+            f"Phone numbers shared by several accounts ({len(duplicates)}): {listed}. "
+            "Review them with 'python manage.py resolve_duplicate_phone_keys --dry-run', "
+            "resolve them by hand or by running it without --dry-run, then migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0008_name_lower_c_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="user",
+            name="phone_key",
+            field=models.BigIntegerField(editable=False, null=True, unique=True),
+        ),
+        migrations.RemoveIndex(
+            model_name="user",
+            name="users_phone_k_3dc85d_idx",
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-17 09:10
+
+import uuid
+
+from django.db import migrations, models
+
+# 0001_initial created users.id as a BigAutoField while the model has always
+# used a UUID, so inserting a user failed. Every foreign key to users.id is
+# dropped, the referencing columns and users.id are converted with the same
+# deterministic mapping (the id in hex, zero padded to 32 digits), and the
+# keys are restored. Databases that already use a UUID are left alone.
+USER_UUID_SQL = """
+DO $$
+DECLARE
+    fk record;
+BEGIN
+    IF (
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'users' AND column_name = 'id'
+    ) = 'uuid' THEN
+        RETURN;
+    END IF;
+
+    CREATE TEMPORARY TABLE user_id_fks ON COMMIT DROP AS
+    SELECT c.conrelid::regclass AS relation, c.conname, a.attname,
+           pg_get_constraintdef(c.oid) AS definition
+    FROM pg_constraint c
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+    WHERE c.contype = 'f' AND c.confrelid = 'users'::regclass;
+
+    FOR fk IN SELECT * FROM user_id_fks LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.relation, fk.conname);
+        EXECUTE format(
+            'ALTER TABLE %s ALTER COLUMN %I TYPE uuid USING lpad(to_hex(%I), 32, ''0'')::uuid',
+            fk.relation, fk.attname, fk.attname
+        );
+    END LOOP;
+
+    ALTER TABLE users ALTER COLUMN id DROP IDENTITY IF EXISTS;
+    ALTER TABLE users ALTER COLUMN id DROP DEFAULT;
+    ALTER TABLE users ALTER COLUMN id TYPE uuid USING lpad(to_hex(id), 32, '0')::uuid;
+
+    FOR fk IN SELECT * FROM user_id_fks LOOP
+        EXECUTE format('ALTER TABLE %s ADD CONSTRAINT %I %s', fk.relation, fk.conname, fk.definition);
+    END LOOP;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0009_unique_phone_key"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(USER_UUID_SQL)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="user",
+                    name="id",
+                    field=models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+            ],
+        ),
+    ]
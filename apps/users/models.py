@@ -4,12 +4,14 @@ from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.core.validators import RegexValidator, EmailValidator
 from django.contrib.postgres.search import SearchVectorField
-from django.contrib.postgres.indexes import GinIndex
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.contrib.postgres.search import SearchVector
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Collate, Lower
 from django.utils import timezone
 
+from apps.core.invalidation import publish
+from apps.core.phone import to_e164, to_phone_key
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, phone_number, name, password=None, **extra_fields):
         if not phone_number:
@@ -44,6 +46,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     phone_number = models.CharField(validators=[phone_regex], max_length=17, unique=True)
     email = models.CharField(validators=[EmailValidator()], null=True, blank=True, unique=True)
+    e164 = models.CharField(max_length=17, null=True, editable=False)  # Canonical form used for lookups
+    phone_key = models.BigIntegerField(null=True, unique=True, editable=False)  # e164 digits, one account per number
     
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -52,7 +56,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    name_search_vector = SearchVectorField(null=True)
+    name_search_vector = SearchVectorField(null=True)  # Maintained by a database trigger
+    contact_sync_version = models.BigIntegerField(default=0)
     
     USERNAME_FIELD = 'phone_number'
     REQUIRED_FIELDS = ['name']
@@ -66,14 +71,91 @@ class User(AbstractBaseUser, PermissionsMixin):
             models.Index(fields=['name']),
             models.Index(fields=['email']),
             GinIndex(fields=['name_search_vector']),
+            GinIndex(
+                OpClass(Lower('name'), name='gin_trgm_ops'),
+                name='users_name_trgm_gin'
+            ),
+            # Byte ordered, so name prefix matches are read off in order
+            models.Index(
+                Collate(Lower('name'), 'C'),
+                name='users_name_lower_c_idx'
+            ),
         ]
     
     def __str__(self):
         return f"{self.name} ({self.phone_number})"
-    
-@receiver(post_save, sender=User)
-def update_search_vector(sender, instance, **kwargs):
-    """Update search vector when user is saved"""
-    User.objects.filter(pk=instance.pk).update(
-        name_search_vector=SearchVector('name')
-    )
\ No newline at end of file
+
+    # Fields that appear in search results
+    SEARCHABLE_FIELDS = ('name', 'e164', 'email')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so cached searches for them can be purged
+        instance._loaded = {
+            field: instance.__dict__.get(field) for field in cls.SEARCHABLE_FIELDS
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.e164 = to_e164(self.phone_number)
+        self.phone_key = to_phone_key(self.e164)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'e164', 'phone_key'}
+
+        loaded = getattr(self, '_loaded', {})
+        changed = self._state.adding or any(
+            loaded.get(field) != getattr(self, field) for field in self.SEARCHABLE_FIELDS
+        )
+        super().save(*args, **kwargs)
+        # Logins and password changes do not touch cached searches
+        if changed:
+            publish(
+                phone_numbers=[self.e164, loaded.get('e164')],
+                names=[self.name, loaded.get('name')]
+            )
+        self._loaded = {field: getattr(self, field) for field in self.SEARCHABLE_FIELDS}
+
+    @classmethod
+    def visible_emails(cls, requester, phone_numbers):
+        """
+        Map the registered users among phone_numbers to the email requester may see
+        phone_numbers and the returned keys are E.164. Users see their own email and the email of anyone who has them as a
+        contact, every other email maps to None. One query for the whole set.
+        """
+        rows = cls._visible_email_rows(requester, phone_numbers)
+        return cls._visible_email_map(requester, rows) if rows is not None else {}
+
+    @classmethod
+    async def avisible_emails(cls, requester, phone_numbers):
+        """visible_emails for async views"""
+        rows = cls._visible_email_rows(requester, phone_numbers)
+        return cls._visible_email_map(requester, [row async for row in rows]) if rows is not None else {}
+
+    @classmethod
+    def _visible_email_rows(cls, requester, phone_numbers):
+        from apps.contacts.models import Contact
+
+        phone_keys = {to_phone_key(n) for n in phone_numbers} - {None}
+        if not phone_keys:
+            return None
+        return cls.objects.filter(
+            phone_key__in=phone_keys
+        ).annotate(
+            email_visible=Exists(Contact.objects.filter(
+                user=OuterRef('pk'),
+                phone_key=requester.phone_key
+            ))
+        ).values_list('e164', 'email', 'email_visible')
+
+    @staticmethod
+    def _visible_email_map(requester, rows):
+        return {
+            phone_number: email if visible or phone_number == requester.e164 else None
+            for phone_number, email, visible in rows
+        }
+
+    def delete(self, *args, **kwargs):
+        publish(phone_numbers=[self.e164], names=[self.name])
+        return super().delete(*args, **kwargs)
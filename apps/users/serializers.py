@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import models
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer as JWTTokenRefreshSerializer
 
+from apps.core.phone import to_e164, to_phone_key
+
 User = get_user_model()
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -18,6 +21,15 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             'name': {'required': True}
         }
         
+    def validate_phone_number(self, value):
+        """The same number in another format belongs to the same account"""
+        phone_key = to_phone_key(to_e164(value))
+        if phone_key is None:
+            raise serializers.ValidationError("Enter the phone number with its country code.")
+        if User.objects.filter(phone_key=phone_key).exists():
+            raise serializers.ValidationError("user with this phone number already exists.")
+        return value
+
     def validate(self, attrs):
         if attrs['password'] != attrs.pop('password_confirm'):
             raise serializers.ValidationError({"password": "Password fields didn't match."})
@@ -36,9 +48,26 @@ class UserLoginSerializer(serializers.Serializer):
     phone_number = serializers.CharField(required=True)
     password = serializers.CharField(required=True, write_only=True)
     
+class UserProfileListSerializer(serializers.ListSerializer):
+    """
+    Resolves email visibility for every profile in one query
+    before the users are serialized
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        users = list(iterable)
+        request = self.context.get('request')
+        if request:
+            self.context['visible_emails'] = User.visible_emails(
+                request.user,
+                (user.e164 for user in users)
+            )
+        return super().to_representation(users)
+
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
+        list_serializer_class = UserProfileListSerializer
         fields = ('id', 'name', 'phone_number', 'email')
         extra_kwargs = {
             'phone_number': {'read_only': True},
@@ -54,7 +83,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         
         # Hide email unless requester is in user's contacts
         if request and request.user != instance:
-            if not instance.contacts.filter(phone_number=request.user.phone_number).exists():
+            visible_emails = self.context.get('visible_emails')
+            if visible_emails is None:
+                visible_emails = User.visible_emails(request.user, [instance.e164])
+            if not visible_emails.get(instance.e164):
                 data.pop('email', None)
         
         return data
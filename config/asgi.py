@@ -13,3 +13,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_asgi_application()
+
+# Load the reported numbers filter before the first request
+from apps.spam.bloom import reported_numbers  # noqa: E402
+
+reported_numbers.warm()
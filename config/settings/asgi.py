@@ -0,0 +1,14 @@
+"""
+Settings profile for serving the API with uvicorn.
+
+    DJANGO_SETTINGS_MODULE=config.settings.asgi uvicorn config.asgi:application --workers 4
+"""
+from .base import *
+
+# Lookups are served by the async views instead of holding a thread each
+ASYNC_LOOKUP_VIEWS = True
+
+# Async views run their queries on short-lived threads, which would each
+# keep a persistent connection open. Put a pooler such as PgBouncer in
+# front of Postgres instead.
+DATABASES['default']['CONN_MAX_AGE'] = 0
@@ -77,6 +77,55 @@ DATABASES = {
     )
 }
 
+# Cache
+# Redis is shared by every worker. Without REDIS_URL a file-based cache
+# stands in locally and in tests so separate processes still share entries.
+# Each app gets its own alias with a key prefix and a version that can be
+# bumped to invalidate everything that app has cached.
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv('CACHE_COMPRESS_MIN_BYTES', '1024'))
+
+
+def _cache_config(alias):
+    if REDIS_URL:
+        config = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'serializer': 'apps.core.cache.CompressedRedisSerializer',
+                'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', '50')),
+                'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', '1.0')),
+                'health_check_interval': 30,
+            },
+        }
+    else:
+        config = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(
+                os.getenv('CACHE_DIR', '/tmp/spam_detector_cache'), alias
+            ),
+        }
+    config['KEY_PREFIX'] = alias
+    config['VERSION'] = int(os.getenv(f'{alias.upper()}_CACHE_VERSION', '1'))
+    return config
+
+
+CACHES = {
+    'default': _cache_config('default'),
+    'search': _cache_config('search'),
+    'spam': _cache_config('spam'),
+}
+
+# Search and spam entries are purged by write events, so the TTLs only
+# bound how long an entry can outlive a missed event
+SEARCH_CACHE_TIMEOUT = int(os.getenv('SEARCH_CACHE_TIMEOUT', str(6 * 3600)))
+SPAM_CACHE_TIMEOUT = int(os.getenv('SPAM_CACHE_TIMEOUT', str(6 * 3600)))
+# Lifetime of the invalidation tag versions. An expired tag turns every
+# entry carrying it into a miss, so this must outlast the entry TTLs above.
+CACHE_TAG_TIMEOUT = int(os.getenv(
+    'CACHE_TAG_TIMEOUT', str(4 * max(SEARCH_CACHE_TIMEOUT, SPAM_CACHE_TIMEOUT))
+))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -127,11 +176,81 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/day',
-        'user': '1000/day'
+        'anon': os.getenv('ANON_THROTTLE_RATE', '100/day'),
+        'user': os.getenv('USER_THROTTLE_RATE', '1000/day')
     }
 }
 
+# Serve caller ID, spam status and contact lookups from async views on
+# their usual paths, for ASGI deployments (see config/settings/asgi.py)
+ASYNC_LOOKUP_VIEWS = os.getenv('ASYNC_LOOKUP_VIEWS', 'False') == 'True'
+
+# Search settings
+# Upper bound on candidate rows read from each match tier of users and contacts per name search
+SEARCH_CANDIDATE_LIMIT = int(os.getenv('SEARCH_CANDIDATE_LIMIT', '5000'))
+# Shortest name query matched as a substring, shorter ones only match names and words by prefix
+SEARCH_SUBSTRING_MIN_LENGTH = int(os.getenv('SEARCH_SUBSTRING_MIN_LENGTH', '3'))
+# Most numbers accepted by /api/search/phone/batch/ in one request
+PHONE_BATCH_MAX_NUMBERS = int(os.getenv('PHONE_BATCH_MAX_NUMBERS', '1000'))
+
+# Spam statistics settings
+# Fresh reports at which a number's spam likelihood reaches 100%
+SPAM_LIKELIHOOD_FULL_REPORTS = int(os.getenv('SPAM_LIKELIHOOD_FULL_REPORTS', '5'))
+# Lower bounds of the medium and high likelihood distribution buckets, in
+# decayed report weight (fresh reports), medium starts where the likelihood
+# saturates unless overridden
+SPAM_DISTRIBUTION_MEDIUM_REPORTS = int(
+    os.getenv('SPAM_DISTRIBUTION_MEDIUM_REPORTS', str(SPAM_LIKELIHOOD_FULL_REPORTS))
+)
+SPAM_DISTRIBUTION_HIGH_REPORTS = int(os.getenv('SPAM_DISTRIBUTION_HIGH_REPORTS', '10'))
+# Reports lose half their weight in a number's spam score every
+# SPAM_SCORE_HALF_LIFE_DAYS, and SPAM_SCORE_FUNCTION maps the decayed weight
+# to a likelihood (by default linearly, saturating at SPAM_LIKELIHOOD_FULL_REPORTS)
+SPAM_SCORE_HALF_LIFE_DAYS = float(os.getenv('SPAM_SCORE_HALF_LIFE_DAYS', '30'))
+SPAM_SCORE_FUNCTION = os.getenv('SPAM_SCORE_FUNCTION', 'apps.spam.scoring.linear_likelihood')
+# Most reported numbers kept by refresh_spam_statistics
+SPAM_STATISTICS_TOP_NUMBERS = int(os.getenv('SPAM_STATISTICS_TOP_NUMBERS', '10'))
+
+# Most numbers accepted by /api/spam/report/bulk/ in one request
+SPAM_BULK_REPORT_MAX_NUMBERS = int(os.getenv('SPAM_BULK_REPORT_MAX_NUMBERS', '100'))
+
+# Spam report queue settings
+# With SPAM_REPORT_QUEUE_ENABLED reports are appended to an outbox table and
+# acknowledged right away, drain_spam_reports inserts and counts them in
+# batches of SPAM_REPORT_QUEUE_BATCH_SIZE
+SPAM_REPORT_QUEUE_ENABLED = os.getenv('SPAM_REPORT_QUEUE_ENABLED', 'False') == 'True'
+SPAM_REPORT_QUEUE_BATCH_SIZE = int(os.getenv('SPAM_REPORT_QUEUE_BATCH_SIZE', '1000'))
+
+# Spam filter settings
+# Per-worker Bloom filter of reported numbers, sized for SPAM_FILTER_CAPACITY
+# numbers at SPAM_FILTER_ERROR_RATE false positives (1M at 1% is ~1.2MB).
+# Workers replay reports from other workers every SPAM_FILTER_SYNC_SECONDS,
+# reload the shared snapshot every SPAM_FILTER_REFRESH_SECONDS and rebuild
+# it from spam_scores in a background thread once it is older than
+# SPAM_FILTER_MAX_AGE (or run rebuild_spam_filter from cron).
+# On by default only with Redis, the file cache is not shared between hosts.
+SPAM_FILTER_ENABLED = os.getenv('SPAM_FILTER_ENABLED', str(bool(REDIS_URL))) == 'True'
+SPAM_FILTER_CAPACITY = int(os.getenv('SPAM_FILTER_CAPACITY', '1000000'))
+SPAM_FILTER_ERROR_RATE = float(os.getenv('SPAM_FILTER_ERROR_RATE', '0.01'))
+SPAM_FILTER_SYNC_SECONDS = float(os.getenv('SPAM_FILTER_SYNC_SECONDS', '1'))
+SPAM_FILTER_REFRESH_SECONDS = int(os.getenv('SPAM_FILTER_REFRESH_SECONDS', '300'))
+SPAM_FILTER_MAX_AGE = int(os.getenv('SPAM_FILTER_MAX_AGE', '3600'))
+SPAM_FILTER_BUILD_TIMEOUT = int(os.getenv('SPAM_FILTER_BUILD_TIMEOUT', '600'))
+# Reports must stay in the log until every snapshot that predates them is rebuilt
+SPAM_FILTER_LOG_TIMEOUT = SPAM_FILTER_MAX_AGE + SPAM_FILTER_BUILD_TIMEOUT + SPAM_FILTER_REFRESH_SECONDS
+
+# Phone number settings
+# Region used to read numbers typed without a leading +, e.g. IN or US.
+# When unset such numbers are rejected, as (700) 000-0003 could be read
+# as a national number or as +7 000 000 0003.
+PHONE_DEFAULT_REGION = os.getenv('PHONE_DEFAULT_REGION') or None
+# Distinct raw numbers whose parsed E.164 form is kept in memory per worker
+PHONE_PARSE_CACHE_SIZE = int(os.getenv('PHONE_PARSE_CACHE_SIZE', '65536'))
+
+# Contact settings
+# Largest address book accepted by /api/contacts/import/ in one request
+CONTACT_IMPORT_MAX_ROWS = int(os.getenv('CONTACT_IMPORT_MAX_ROWS', '10000'))
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+# Load the reported numbers filter before the first request
+from apps.spam.bloom import reported_numbers  # noqa: E402
+
+reported_numbers.warm()
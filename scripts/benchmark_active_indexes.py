@@ -0,0 +1,154 @@
+"""
+Compare full and partial (WHERE is_active) spam report indexes.
+
+Builds two copies of a synthetic spam_reports table in a scratch schema,
+one indexed the old way and one with the partial indexes, with a share of
+the reports retracted. Reports index sizes and the server-side latency of
+the COUNT queries behind /api/spam/status/. The schema is dropped
+afterwards unless --keep is given.
+
+    python scripts/benchmark_active_indexes.py --rows 10000000 --retracted 0.3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import django
+
+# Add the project root directory to Python path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+# Setup Django
+django.setup()
+
+from django.db import connection
+
+SCHEMA = 'bench_active_indexes'
+
+LAYOUTS = {
+    'full': [
+        'CREATE INDEX full_phone_active ON {table} (phone_key, is_active)',
+        'CREATE INDEX full_reporter_phone_active ON {table} (reporter_id, phone_key, is_active)',
+        'CREATE INDEX full_reported_active ON {table} (reported_at, is_active)',
+        'CREATE INDEX full_active ON {table} (is_active)',
+    ],
+    'partial': [
+        'CREATE INDEX partial_phone ON {table} (phone_key) WHERE is_active',
+        'CREATE INDEX partial_phone_reported ON {table} (phone_key, reported_at) WHERE is_active',
+        'CREATE INDEX partial_reporter_phone ON {table} (reporter_id, phone_key) WHERE is_active',
+    ],
+}
+
+QUERIES = {
+    'total reports': (
+        'SELECT COUNT(*) FROM {table} WHERE phone_key = %(phone_key)s AND is_active'
+    ),
+    'recent reports': (
+        'SELECT COUNT(*) FROM {table} WHERE phone_key = %(phone_key)s AND is_active '
+        "AND reported_at >= now() - interval '30 days'"
+    ),
+    'reported by user': (
+        'SELECT EXISTS (SELECT 1 FROM {table} WHERE reporter_id = %(reporter_id)s '
+        'AND phone_key = %(phone_key)s AND is_active)'
+    ),
+}
+
+
+def table_name(layout):
+    return f'{SCHEMA}.reports_{layout}'
+
+
+def build(cursor, rows, retracted, numbers):
+    """Create both tables from one generated data set"""
+    cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+    cursor.execute(f"""
+        CREATE TABLE {SCHEMA}.reports_full AS
+        SELECT md5(i::text)::uuid AS id,
+               md5((i %% 500000)::text)::uuid AS reporter_id,
+               916000000000 + (random() * %s)::bigint AS phone_key,
+               now() - random() * interval '365 days' AS reported_at,
+               random() >= %s AS is_active
+        FROM generate_series(1, %s) AS i
+    """, [numbers, retracted, rows])
+    cursor.execute(f'CREATE TABLE {SCHEMA}.reports_partial AS SELECT * FROM {SCHEMA}.reports_full')
+    for layout, statements in LAYOUTS.items():
+        for sql in statements:
+            cursor.execute(sql.format(table=table_name(layout)))
+        cursor.execute(f'VACUUM ANALYZE {table_name(layout)}')
+
+
+def index_sizes(cursor):
+    cursor.execute("""
+        SELECT relname, indexrelname, pg_relation_size(indexrelid)
+        FROM pg_stat_user_indexes WHERE schemaname = %s
+    """, [SCHEMA])
+    sizes = {}
+    for table, index, size in cursor.fetchall():
+        sizes.setdefault(table.replace('reports_', ''), {})[index] = size
+    return sizes
+
+
+def execution_ms(cursor, sql, params):
+    cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Execution Time']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--retracted', type=float, default=0.3, help='Share of retracted reports')
+    parser.add_argument('--numbers', type=int, default=1_000_000, help='Distinct reported numbers')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema')
+    args = parser.parse_args()
+
+    with connection.cursor() as cursor:
+        started = time.perf_counter()
+        print(f'Building 2 x {args.rows} rows, {args.retracted:.0%} retracted, in {SCHEMA}...')
+        build(cursor, args.rows, args.retracted, args.numbers)
+        print(f'Built in {time.perf_counter() - started:.1f}s\n')
+
+        for layout, sizes in sorted(index_sizes(cursor).items()):
+            print(f'{layout} indexes: {sum(sizes.values()) / 2 ** 20:.1f} MiB')
+            for index, size in sorted(sizes.items()):
+                print(f'  {index}: {size / 2 ** 20:.1f} MiB')
+
+        cursor.execute(
+            f'SELECT reporter_id, phone_key FROM {table_name("full")} TABLESAMPLE SYSTEM (1) '
+            'WHERE is_active LIMIT 10000'
+        )
+        samples = cursor.fetchall()
+
+        print(f'\nMedian execution time over {args.repeats} runs')
+        for name, sql in QUERIES.items():
+            timings = {}
+            for layout in LAYOUTS:
+                timings[layout] = statistics.median(
+                    execution_ms(
+                        cursor,
+                        sql.format(table=table_name(layout)),
+                        dict(zip(('reporter_id', 'phone_key'), random.choice(samples)))
+                    )
+                    for _ in range(args.repeats)
+                )
+            print(f'  {name}: full {timings["full"]:.3f} ms, partial {timings["partial"]:.3f} ms')
+
+        if not args.keep:
+            cursor.execute(f'DROP SCHEMA {SCHEMA} CASCADE')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Compare the WSGI and ASGI deployments under concurrent lookups.
+
+Start both servers against the same database, with the user throttle
+out of the way, e.g.
+
+    export USER_THROTTLE_RATE=100000000/day
+    gunicorn config.wsgi --bind 127.0.0.1:8000 --workers 4 --threads 8
+    DJANGO_SETTINGS_MODULE=config.settings.asgi uvicorn config.asgi:application --port 8001 --workers 4
+
+then run
+
+    python scripts/benchmark_asgi.py --concurrency 1,16,64,256
+
+Every concurrency level sends the same mix of caller ID, spam status and
+contact lookups to each server as a user from the database, and reports
+throughput and client-side latency.
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+import django
+
+# Add the project root directory to Python path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+# Setup Django
+django.setup()
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.contacts.models import Contact
+from apps.spam.models import SpamScore
+from apps.users.models import User
+
+
+def lookup_paths(user, count):
+    """A mix of the three async lookups over numbers that exist"""
+    contact_numbers = list(
+        Contact.objects.filter(user=user).values_list('e164', flat=True)[:count]
+    )
+    numbers = contact_numbers + list(
+        SpamScore.objects.values_list('phone_number', flat=True)[:count]
+    ) + list(User.objects.values_list('e164', flat=True)[:count])
+    paths = []
+    for number in numbers:
+        paths.append(f'/api/search/phone/?q={quote(number)}')
+        paths.append(f'/api/spam/status/{quote(number)}/')
+    for number in contact_numbers:
+        paths.append(f'/api/contacts/phone/{quote(number)}/')
+    return paths
+
+
+def run(base_url, paths, token, concurrency, requests):
+    """Send requests lookups from concurrency threads, returning (seconds, latencies, errors)"""
+    queue = itertools.islice(itertools.cycle(paths), requests)
+    lock = threading.Lock()
+    latencies = []
+    errors = 0
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                path = next(queue, None)
+            if path is None:
+                return
+            request = urllib.request.Request(
+                base_url + path,
+                headers={'Authorization': f'Bearer {token}'}
+            )
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                failed = False
+            except urllib.error.HTTPError as e:
+                failed = e.code >= 500 or e.code == 429
+            except OSError:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values, share):
+    return sorted(values)[min(len(values) - 1, int(len(values) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--wsgi', default='http://127.0.0.1:8000', help='Base URL of the WSGI server')
+    parser.add_argument('--asgi', default='http://127.0.0.1:8001', help='Base URL of the ASGI server')
+    parser.add_argument('--phone-number', help='User to look up as, defaults to the first user')
+    parser.add_argument('--concurrency', default='1,16,64,256', help='Comma separated client concurrency levels')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per server and level')
+    parser.add_argument('--numbers', type=int, default=100, help='Numbers of each kind to look up')
+    args = parser.parse_args()
+
+    users = User.objects.order_by('date_joined')
+    user = users.get(e164=args.phone_number) if args.phone_number else users.first()
+    token = str(RefreshToken.for_user(user).access_token)
+    paths = lookup_paths(user, args.numbers)
+    print(f'{len(paths)} lookup paths as {user.e164}, {args.requests} requests per run\n')
+
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        for name, base_url in (('wsgi', args.wsgi), ('asgi', args.asgi)):
+            # One untimed pass so both servers start with warm caches
+            run(base_url, paths, token, min(concurrency, 16), len(paths))
+            seconds, latencies, errors = run(base_url, paths, token, concurrency, args.requests)
+            print(
+                f'  {name} x{concurrency}: {len(latencies) / seconds:.0f} req/s, '
+                f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+                f'p99 {percentile(latencies, 0.99) * 1000:.1f} ms, {errors} errors'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Compare varchar E.164 keys with BIGINT phone keys on a synthetic table.
+
+Builds a scratch table of contact-like rows carrying both key forms,
+indexes each the way contacts are indexed, and reports index sizes and
+server-side lookup latency. Everything lives in its own schema, which is
+dropped afterwards unless --keep is given.
+
+    python scripts/benchmark_phone_keys.py --rows 10000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import django
+
+# Add the project root directory to Python path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+# Setup Django
+django.setup()
+
+from django.db import connection
+
+SCHEMA = 'bench_phone_keys'
+
+# Indexes compared pairwise, varchar first
+INDEXES = [
+    ('e164', 'CREATE INDEX bench_e164 ON {schema}.contacts (e164)'),
+    ('phone_key', 'CREATE INDEX bench_phone_key ON {schema}.contacts (phone_key)'),
+    ('e164, user_id', 'CREATE INDEX bench_e164_user ON {schema}.contacts (e164, user_id)'),
+    ('phone_key, user_id', 'CREATE INDEX bench_phone_key_user ON {schema}.contacts (phone_key, user_id)'),
+]
+
+
+def build(cursor, rows):
+    """Create the scratch table with rows random Indian mobile numbers"""
+    cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+    cursor.execute(f"""
+        CREATE TABLE {SCHEMA}.contacts AS
+        SELECT phone_key, ('+' || phone_key)::varchar(17) AS e164, user_id
+        FROM (
+            SELECT 916000000000 + (random() * 3999999999)::bigint AS phone_key,
+                   md5(i::text)::uuid AS user_id
+            FROM generate_series(1, %s) AS i
+        ) generated
+    """, [rows])
+    for _, sql in INDEXES:
+        cursor.execute(sql.format(schema=SCHEMA))
+    cursor.execute(f'VACUUM ANALYZE {SCHEMA}.contacts')
+
+
+def index_sizes(cursor):
+    cursor.execute("""
+        SELECT indexrelname, pg_relation_size(indexrelid)
+        FROM pg_stat_user_indexes WHERE schemaname = %s
+    """, [SCHEMA])
+    return dict(cursor.fetchall())
+
+
+def execution_ms(cursor, sql, params):
+    cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Execution Time']
+
+
+def measure(cursor, sample, batch_size, repeats):
+    """Median execution time of point and batched lookups for each key form"""
+    cursor.execute(f'SELECT phone_key FROM {SCHEMA}.contacts TABLESAMPLE SYSTEM (1) LIMIT %s', [sample])
+    keys = [row[0] for row in cursor.fetchall()]
+    results = {}
+    for column, cast, to_param in (
+        ('e164', 'varchar', lambda key: f'+{key}'),
+        ('phone_key', 'bigint', lambda key: key),
+    ):
+        point = [
+            execution_ms(
+                cursor,
+                f'SELECT count(*) FROM {SCHEMA}.contacts WHERE {column} = %s',
+                [to_param(random.choice(keys))]
+            )
+            for _ in range(repeats)
+        ]
+        batch = [
+            execution_ms(
+                cursor,
+                f"""
+                SELECT count(*) FROM unnest(%s::{cast}[]) AS q(k)
+                JOIN {SCHEMA}.contacts c ON c.{column} = q.k
+                """,
+                [[to_param(key) for key in random.sample(keys, min(batch_size, len(keys)))]]
+            )
+            for _ in range(repeats)
+        ]
+        results[column] = (statistics.median(point), statistics.median(batch))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000, help='Numbers per batched lookup')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema')
+    args = parser.parse_args()
+
+    with connection.cursor() as cursor:
+        started = time.perf_counter()
+        print(f'Building {args.rows} rows in {SCHEMA}...')
+        build(cursor, args.rows)
+        print(f'Built in {time.perf_counter() - started:.1f}s\n')
+
+        sizes = index_sizes(cursor)
+        print('Index sizes')
+        for (label, sql) in INDEXES:
+            name = sql.split()[2]
+            print(f'  ({label}): {sizes[name] / 2 ** 20:.1f} MiB')
+
+        print(f'\nMedian execution time over {args.repeats} runs')
+        results = measure(cursor, max(args.batch_size * 10, 10000), args.batch_size, args.repeats)
+        for column, (point, batch) in results.items():
+            print(f'  {column}: point lookup {point:.3f} ms, {args.batch_size}-number join {batch:.2f} ms')
+
+        if not args.keep:
+            cursor.execute(f'DROP SCHEMA {SCHEMA} CASCADE')
+
+
+if __name__ == '__main__':
+    main()
@@ -18,10 +18,11 @@ django.setup()
 
 # Import models after Django setup
 from django.utils import timezone
+from django.core.management import call_command
 from django.db import transaction
 from apps.users.models import User
 from apps.contacts.models import Contact
-from apps.spam.models import SpamReport
+from apps.spam.models import SpamReport, SpamScore
 
 # Sample data
 NAMES = [
@@ -131,7 +132,7 @@ def create_spam_reports(users, spam_probability=0.2):
                     # Check if user hasn't already reported this number
                     if not SpamReport.objects.filter(
                         reporter=user, 
-                        phone_number=contact.phone_number,
+                        phone_key=contact.phone_key,
                         is_active=True
                     ).exists():
                         report = SpamReport.objects.create(
@@ -139,6 +140,7 @@ def create_spam_reports(users, spam_probability=0.2):
                             phone_number=contact.phone_number,
                             is_active=True
                         )
+                        SpamScore.record_report(report.e164, report.reported_at)
                         reports.append(report)
                         print(f"Created spam report by {user.name} for number {contact.phone_number}")
         except Exception as e:
@@ -156,6 +158,8 @@ def run():
         SpamReport.objects.all().delete()
         Contact.objects.all().delete()
         User.objects.exclude(is_superuser=True).delete()
+        # Drop the scores of numbers that no longer have reports
+        call_command('rebuild_spam_scores')
 
         # Create new data
         users = create_users(20)  # Create 20 users
@@ -179,4 +183,7 @@ def run():
 
 if __name__ == "__main__":
     print("Starting database population...")
-    run()
\ No newline at end of file
+    run()
+    # Recount the statistics rollups from the seeded reports, after the
+    # reset's deletes and the reports' own hourly counts have committed
+    call_command('refresh_spam_statistics', rebuild_hourly=True)
\ No newline at end of file